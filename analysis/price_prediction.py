@@ -1,4 +1,3 @@
-import re
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
@@ -13,20 +12,22 @@ from sklearn.metrics import r2_score, mean_squared_error
 import xgboost as xgb
 
 # Load the data
-df = pd.read_parquet("../all_car_details.parquet")
+df = pd.read_parquet("../all_car_details")  # Partitioned by make and scrape_date
 print("Data loaded successfully.")
 print(f"Data shape: {df.shape}")
 
 # Data cleaning and preprocessing (same as in notebook)
-df.drop(columns=["url", "electric_range", "model_code",
+df.drop(columns=["url", "scrape_date", "electric_range", "model_code",
                  "manufacturer_colour", "country_version", "general_inspection"], inplace=True)
+# The equipment is also stored as raw ';'-joined text, the lists are used below
+df.drop(columns=[col for col in df.columns if col.endswith("_raw")], inplace=True)
 df = df[df['price'].notnull()]
 upper_price_threshold = df['price'].quantile(0.99)
 lower_price_threshold = df['price'].quantile(0.01)
 df_cleaned = df[(df['price'] < upper_price_threshold) & (
     df['price'] > lower_price_threshold)].copy()
 df_cleaned['first_registration'] = pd.to_datetime(
-    df_cleaned['first_registration'], format='%Y-%m', errors='coerce')
+    df_cleaned['first_registration'])  # Stored as a date
 current_date = pd.to_datetime('now')
 df_cleaned['age_months'] = (current_date.year - df_cleaned['first_registration'].dt.year) * \
     12 + (current_date.month - df_cleaned['first_registration'].dt.month)
@@ -34,45 +35,18 @@ df_cleaned.drop(columns=['first_registration'], inplace=True, axis=1)
 df_cleaned = df_cleaned[df_cleaned['age_months'] >= 0]
 print(f"Data shape after cleaning: {df_cleaned.shape}")
 
-
-def convert_fuel_consumption(val):
-    if pd.isna(val):
-        return np.nan
-    match = re.search(r"[\d\.]+", val)
-    if match:
-        try:
-            return float(match.group())
-        except ValueError:
-            return np.nan
-    return np.nan
-
-
-if df_cleaned['fuel_consumption'].dtype != 'float64':
-    df_cleaned['fuel_consumption'] = df_cleaned['fuel_consumption'].apply(
-        convert_fuel_consumption)
-numeric_cols = ['seats', 'doors', 'gears', 'cylinders']
-for col in numeric_cols:
-    df_cleaned[col] = pd.to_numeric(df_cleaned[col], errors='coerce')
-
-print("Converted fuel consumption and numeric columns to float.")
+# Numeric columns (seats, doors, gears, cylinders, fuel_consumption) arrive typed from the scraper
 df_cleaned_split = df_cleaned.copy()
 
 
-def process_semicolon_column(df, colname, delimiter=';'):
-    new_colname = f"{colname}_list"
-
-    def split_values(val):
-        if pd.isna(val):
-            return None
-        return [item.strip() for item in val.split(delimiter) if item.strip()]
-
-    df[new_colname] = df[colname].apply(split_values)
-    not_missing = df[new_colname].notna()
+def process_list_column(df, colname):
+    # Equipment columns are stored as lists of items, no splitting needed
+    not_missing = df[colname].notna()
     if not not_missing.any():
         print(f"No non-missing values found in {colname}")
         return df
     mlb = MultiLabelBinarizer()
-    encoded = pd.DataFrame(mlb.fit_transform(df.loc[not_missing, new_colname]),
+    encoded = pd.DataFrame(mlb.fit_transform(df.loc[not_missing, colname]),
                            columns=mlb.classes_,
                            index=df.loc[not_missing].index)
     df = pd.concat([df, encoded], axis=1)
@@ -82,14 +56,14 @@ def process_semicolon_column(df, colname, delimiter=';'):
 columns_to_process = ['comfort_and_convenience',
                       'entertainment_and_media', 'safety_and_security', 'extras']
 for col in columns_to_process:
-    df_cleaned_split = process_semicolon_column(df_cleaned_split, col)
-    df_cleaned_split.drop(columns=[col, f"{col}_list"], inplace=True)
+    df_cleaned_split = process_list_column(df_cleaned_split, col)
+    df_cleaned_split.drop(columns=[col], inplace=True)
 
 df_cleaned_split['location'] = df_cleaned_split['location'].apply(
     lambda loc: loc.split(', ')[-1].strip() if pd.notna(loc) else None)
 df_cleaned_split['location'] = df_cleaned_split['location'].str.extract(
     r'([A-Za-z]{2})')
-print("Processed semicolon-separated columns and location.")
+print("Processed equipment list columns and location.")
 
 
 # Prepare data for XGBoost
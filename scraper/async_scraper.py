@@ -0,0 +1,104 @@
+from utils.car_details_scraper import scrape_car_record_from_html
+from utils.http_session import DEFAULT_HEADERS, CONNECT_TIMEOUT, READ_TIMEOUT
+from utils.html_archive import archive_page
+from utils.listing_state import get_listing_state
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import aiohttp
+import os
+
+
+async def fetch_car_page_async(session, url, make=None):
+    """
+    Fetches the raw HTML of a detail page, returning None if the request failed or,
+    in incremental mode, the page is unchanged.
+    """
+    try:
+        state = get_listing_state()
+        headers = state.conditional_headers(url) if state else {}
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                return None  # Not modified since the last run
+            if response.status == 200:
+                html = await response.read()
+                if state:
+                    state.record_fetch(url, make, response.headers.get(
+                        "ETag"), response.headers.get("Last-Modified"))
+                return html
+            print(f"Failed to retrieve page: {response.status}")
+            return None
+    except Exception as e:
+        print(f"An error occurred while fetching the URL: {e}")
+        return None
+
+
+async def scrape_car_details_async(car_links, make, max_in_flight=64, queue_size=256, parse_workers=None, on_result=None):
+    """
+    Scrapes the car details of the given links with asyncio.
+
+    At most `max_in_flight` requests run at a time (semaphore-bounded), and
+    fetched pages are handed through a bounded queue to parser workers, which
+    extract the records in a process pool. Once the queue is full, fetching
+    waits for the parsers, so memory stays flat for makes of any size.
+    `on_result` is called with every scraped record as it arrives, instead of
+    collecting them. Returns the collected records and the number scraped.
+    """
+    loop = asyncio.get_running_loop()
+    parse_workers = parse_workers or os.cpu_count()
+    semaphore = asyncio.Semaphore(max_in_flight)
+    page_queue = asyncio.Queue(maxsize=queue_size)
+    car_details_list = []
+    scraped = 0
+    processed = 0
+
+    async def fetch(session, url):
+        try:
+            html = await fetch_car_page_async(session, url, make)
+            if html is not None:
+                await loop.run_in_executor(None, archive_page, url, html, make)
+            await page_queue.put((url, html))
+        finally:
+            semaphore.release()
+
+    async def parse(executor):
+        nonlocal processed, scraped
+        while True:
+            item = await page_queue.get()
+            if item is None:
+                break
+            url, html = item
+            if html is not None:
+                try:
+                    details = await loop.run_in_executor(
+                        executor, scrape_car_record_from_html, html, url, make)
+                    if details:
+                        scraped += 1
+                        if on_result:
+                            on_result(details)
+                        else:
+                            car_details_list.append(details)
+                except Exception as e:
+                    print(f"An error occurred while parsing {url}: {e}")
+            processed += 1
+            print(f"-> {processed}/{len(car_links)} processed", end="\r")
+
+    connector = aiohttp.TCPConnector(limit=max_in_flight)
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+    with ProcessPoolExecutor(max_workers=parse_workers) as executor:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=DEFAULT_HEADERS) as session:
+            parsers = [asyncio.create_task(parse(executor))
+                       for _ in range(parse_workers)]
+            fetches = set()
+            for url in car_links:
+                # Only start a new request once one of the in-flight ones is done
+                await semaphore.acquire()
+                task = asyncio.create_task(fetch(session, url))
+                fetches.add(task)
+                task.add_done_callback(fetches.discard)
+            if fetches:
+                await asyncio.gather(*fetches)
+            for _ in parsers:
+                await page_queue.put(None)
+            await asyncio.gather(*parsers)
+    return car_details_list, scraped
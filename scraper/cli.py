@@ -0,0 +1,218 @@
+from crawl_scheduler import crawl_car_links, crawl_car_links_from_queue
+from http_category_crawler import fetch_number_of_offers
+from requests_scraper import scrape_all_car_details, scrape_car_details_from_queue, queue_detail_links, queue_stored_links, DETAIL_SCRAPING_MODES
+from utils.category_page_scraper import plan_power_ranges, MAX_LISTED_OFFERS
+from utils.link_store import LinkStore, LINK_STORE_FILE
+from utils.sharding import parse_shard, power_range_key, shard_output_dir, merge_shard_outputs
+from utils.work_queue import open_work_queue, WORK_QUEUE_LOCATION, CRAWL_QUEUE, DETAILS_QUEUE
+from functools import partial
+import argparse
+import glob
+import json
+import os
+
+
+CAR_MAKES_FILE = './car_make_metadata/car_makes.txt'
+
+
+def read_car_makes(file_path=CAR_MAKES_FILE):
+    with open(file_path, 'r') as f:
+        return f.read().splitlines()
+
+
+def plan_crawl(car_makes, output_file="crawl_plan.json", base_category_url="https://www.autoscout24.com/lst"):
+    """
+    Plans the power ranges of all makes over HTTP and saves them, so every shard
+    splits the crawl along the same ranges. Makes whose offers cannot be counted
+    without a browser are left out and planned by their own shard.
+    """
+    plan = {}
+    for i, car_make in enumerate(car_makes, start=1):
+        make_url = base_category_url + '/' + car_make
+        num_offers = fetch_number_of_offers(make_url)
+        if num_offers is None:
+            print(f"{i}/{len(car_makes)} {car_make}: offers not countable over HTTP, left to its shard.")
+            continue
+        if num_offers <= MAX_LISTED_OFFERS:
+            plan[car_make] = [[None, None, num_offers]] if num_offers else []
+        else:
+            plan[car_make] = [list(power_range) for power_range in
+                              plan_power_ranges(make_url, fetch_number_of_offers)]
+        print(f"{i}/{len(car_makes)} {car_make}: {num_offers} offers, {len(plan[car_make])} tasks.")
+    with open(output_file, 'w') as f:
+        json.dump(plan, f, indent=2)
+    print(f"\nCrawl plan saved to {output_file}")
+
+
+def shard_crawl_tasks(car_makes, shard, plan=None):
+    """
+    Splits the crawl of a shard into the makes it plans itself and the planned
+    (make, min kw, max kw, offer count) ranges it scrapes.
+    """
+    plan = plan or {}
+    own_makes = []
+    power_ranges = []
+    for car_make in car_makes:
+        if car_make not in plan:
+            if shard.owns(car_make):
+                own_makes.append(car_make)
+            continue
+        for low_kw, high_kw, num_offers in plan[car_make]:
+            if shard.owns(power_range_key(car_make, low_kw, high_kw)):
+                power_ranges.append((car_make, low_kw, high_kw, num_offers))
+    return own_makes, power_ranges
+
+
+def run_links(args):
+    car_makes = read_car_makes(args.makes)
+    if args.queue:
+        # Shared backlog: the new links are queued as detail tasks right away
+        work_queue = open_work_queue(args.queue)
+        try:
+            crawl_car_links_from_queue(work_queue, car_makes, args.workers, args.link_store,
+                                       on_links=partial(queue_detail_links, work_queue),
+                                       listings_dir=args.listings_output)
+        finally:
+            work_queue.close()
+        return
+    plan = None
+    if args.plan:
+        with open(args.plan, 'r') as f:
+            plan = json.load(f)
+    if args.shard:
+        if plan is None:
+            # Shards of whole makes are as uneven as the makes, one node would get all big ones
+            raise SystemExit("links --shard needs --plan, run the plan command first")
+        shard = parse_shard(args.shard)
+        car_makes, power_ranges = shard_crawl_tasks(car_makes, shard, plan)
+        print(f"- Shard {shard}: {len(car_makes)} makes to plan, {len(power_ranges)} planned ranges.")
+    else:
+        power_ranges = [(car_make, low_kw, high_kw, num_offers)
+                        for car_make in car_makes if plan and car_make in plan
+                        for low_kw, high_kw, num_offers in plan[car_make]]
+        car_makes = [car_make for car_make in car_makes if not plan or car_make not in plan]
+    crawl_car_links(car_makes, args.workers, args.link_store,
+                    power_ranges=power_ranges, listings_dir=args.listings_output)
+
+
+def run_details(args):
+    if args.queue:
+        work_queue = open_work_queue(args.queue)
+        try:
+            scrape_car_details_from_queue(work_queue, output_dir=args.output, follow=args.follow)
+        finally:
+            work_queue.close()
+        return
+    shard = parse_shard(args.shard) if args.shard else None
+    if shard:
+        output_dir = shard_output_dir(args.output, shard)
+        journal_file = f"scrape_progress.shard-{shard.index}-of-{shard.count}.db"
+        print(f"- Shard {shard}: writing {output_dir}")
+    else:
+        output_dir = args.output
+        journal_file = "scrape_progress.db"
+    scrape_all_car_details(args.start_from, args.mode, journal_file,
+                           output_dir, shard=shard, link_store_file=args.link_store)
+
+
+def run_queue(args):
+    work_queue = open_work_queue(args.queue)
+    try:
+        if args.action == "seed-details":
+            queue_stored_links(work_queue)
+        elif args.action == "requeue-expired":
+            print(f"{work_queue.requeue_expired()} expired leases requeued.")
+        elif args.action == "reset":
+            # Start a new run: the same makes and URLs can be queued again
+            for queue_name in (CRAWL_QUEUE, DETAILS_QUEUE):
+                print(f"{work_queue.reset(queue_name)} tasks dropped from {queue_name}.")
+        for queue_name in (CRAWL_QUEUE, DETAILS_QUEUE):
+            print(f"{queue_name}: {work_queue.counts(queue_name)}")
+    finally:
+        work_queue.close()
+
+
+def run_merge(args):
+    shard_dirs = sorted(glob.glob(f"{glob.escape(args.output)}.shard-*-of-*"))
+    if not shard_dirs:
+        print(f"No shard outputs found next to {args.output}")
+        return
+    added = merge_shard_outputs(shard_dirs, args.output)
+    print(f"Merged {len(shard_dirs)} shard outputs into {args.output} ({added} new part files).")
+
+
+def run_merge_links(args):
+    store = LinkStore(args.link_store)
+    try:
+        for database_file in args.inputs:
+            added = store.merge_from(database_file)
+            print(f"- {database_file}: {added} new links")
+        print(f"Link store {args.link_store} now holds {store.count_links()} links.")
+    finally:
+        store.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Non-interactive scraper runs, optionally split across shards (nodes).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser(
+        "plan", help="Plan the power ranges of all makes, shared by the link shards")
+    plan.add_argument("--makes", default=CAR_MAKES_FILE)
+    plan.add_argument("--output", default="crawl_plan.json")
+    plan.set_defaults(run=lambda args: plan_crawl(
+        read_car_makes(args.makes), args.output))
+
+    links = commands.add_parser("links", help="Crawl car links")
+    links.add_argument("--shard", help="Shard of this node as i/N, e.g. 0/4 (needs --plan)")
+    links.add_argument("--plan", help="Crawl plan written by the plan command")
+    links.add_argument("--makes", default=CAR_MAKES_FILE)
+    links.add_argument("--workers", type=int,
+                       default=max(1, int(os.cpu_count() * 0.8)))
+    links.add_argument("--link-store", default=LINK_STORE_FILE)
+    links.add_argument("--queue", nargs="?", const=WORK_QUEUE_LOCATION,
+                       help="Take the crawl tasks from a shared work queue instead (replaces --shard)")
+    links.add_argument("--listings-output",
+                       help="Also capture the listing summaries of the result pages into this lite dataset (pages through the results in the browser)")
+    links.set_defaults(run=run_links)
+
+    details = commands.add_parser("details", help="Scrape car details of the stored links")
+    details.add_argument("--shard", help="Shard of this node as i/N, e.g. 0/4")
+    details.add_argument("--mode", choices=list(DETAIL_SCRAPING_MODES), default="threads")
+    details.add_argument("--output", default="all_car_details")
+    details.add_argument("--start-from", help="Make to start from")
+    details.add_argument("--link-store", default=LINK_STORE_FILE,
+                         help="Link store to read, with --shard the same merged store on every node")
+    details.add_argument("--queue", nargs="?", const=WORK_QUEUE_LOCATION,
+                         help="Take the detail tasks from a shared work queue instead (replaces --shard)")
+    details.add_argument("--follow", action="store_true",
+                         help="With --queue, keep waiting for new detail tasks instead of stopping once both queues are drained")
+    details.set_defaults(run=run_details)
+
+    work_queue = commands.add_parser("queue", help="Inspect or fill the shared work queue")
+    work_queue.add_argument("action", choices=["status", "seed-details", "requeue-expired", "reset"],
+                            help="reset drops all tasks, run it between runs while no workers are active")
+    work_queue.add_argument("--queue", default=WORK_QUEUE_LOCATION)
+    work_queue.set_defaults(run=run_queue)
+
+    merge = commands.add_parser(
+        "merge", help="Merge the shard outputs of the details command without rewriting them")
+    merge.add_argument("--output", default="all_car_details")
+    merge.set_defaults(run=run_merge)
+
+    merge_links = commands.add_parser(
+        "merge-links", help="Merge the link stores of several nodes")
+    merge_links.add_argument("inputs", nargs="+")
+    merge_links.add_argument("--link-store", default=LINK_STORE_FILE)
+    merge_links.set_defaults(run=run_merge_links)
+    return parser
+
+
+def run_cli(argv=None):
+    args = build_parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == '__main__':
+    run_cli()
@@ -0,0 +1,305 @@
+from selenium_scraper import CarScraperSelenium
+from utils.category_page_scraper import MAX_LISTED_OFFERS, MAX_POWER_KW
+from utils.driver_pool import DriverPool, LazyLease
+from utils.selenium_scraper_setup import setup_selenium_driver, CAPTURE_SEARCH_RESPONSES
+from utils.parquet_writer import CarDetailsWriter
+from utils.work_queue import CRAWL_QUEUE
+from contextlib import contextmanager
+from functools import partial
+import itertools
+import time
+import threading
+import queue
+import os
+
+
+# Task kinds, planning tasks are always taken before scraping tasks
+PLAN_TASK = 0
+SCRAPE_TASK = 1
+STOP_TASK = 2  # Queued once per worker after the last task
+
+
+class CrawlScheduler:
+    """
+    Splits the link crawl into fine-grained tasks on one shared priority queue,
+    worked off by long-lived workers that lease warm browsers from a `DriverPool`
+    only when a page cannot be fetched over HTTP:
+
+    - a planning task counts the offers of a make or of one of its power ranges:
+      a range of at most `MAX_LISTED_OFFERS` offers becomes a scraping task,
+      a larger one is split in half into two new planning tasks
+    - a scraping task paginates through a single (make, power range)
+
+    Every bisection step is its own task, so the count requests of a big make are
+    spread over all workers too. Tasks with more offers are taken first, so a big
+    make is not left to one worker while the others sit idle.
+
+    With `on_listing`, the result pages are paged through in the browser and the
+    listing summaries of their search responses are passed to it (from all workers).
+    """
+
+    def __init__(self, car_makes, workers=None, database_file=None, max_pages_per_driver=500, on_links=None, power_ranges=None, on_listing=None):
+        self.workers = workers or max(1, int(os.cpu_count() * 0.8))
+        self.database_file = database_file
+        self.max_pages_per_driver = max_pages_per_driver
+        self.driver_pool = None
+        self.on_links = on_links  # Optional: called with the make and links of each scraped page
+        self.on_listing = on_listing  # Optional: called with each captured listing summary
+        self.capture_search = CAPTURE_SEARCH_RESPONSES or on_listing is not None
+        self.tasks = queue.PriorityQueue()
+        self.sequence = itertools.count()  # Tie-breaker, keeps equal tasks in FIFO order
+        for car_make in car_makes:
+            self.put_task(PLAN_TASK, 0, car_make)
+        # Ranges planned beforehand, as (make, min kw, max kw, offer count)
+        for car_make, low_kw, high_kw, num_offers in power_ranges or []:
+            self.put_task(SCRAPE_TASK, num_offers if num_offers is not None else MAX_LISTED_OFFERS,
+                          car_make, low_kw, high_kw)
+
+    def put_task(self, kind, num_offers, car_make, low_kw=None, high_kw=None):
+        """Queues a task, scraping tasks with more offers first."""
+        self.tasks.put((kind, -num_offers, next(self.sequence),
+                        car_make, low_kw, high_kw))
+
+    def run(self):
+        """Starts the workers and waits until all tasks are done."""
+        print(f"- Using {self.workers} crawl workers.")
+        self.driver_pool = self.create_driver_pool()
+        try:
+            threads = [threading.Thread(target=self.work, daemon=True)
+                       for _ in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            self.tasks.join()  # Also covers the tasks queued by planning tasks
+            for _ in threads:
+                self.tasks.put((STOP_TASK, 0, next(self.sequence), None, None, None))
+            for thread in threads:
+                thread.join()
+        finally:
+            self.driver_pool.close()
+
+    def create_driver_pool(self):
+        """Creates the browser pool of the workers, recording network events when listings are captured."""
+        return DriverPool(self.workers, max_pages=self.max_pages_per_driver,
+                          create_driver=partial(setup_selenium_driver, capture_network=self.capture_search))
+
+    def next_task(self):
+        """Takes the next task as (task id, kind, make, min kw, max kw), or None on the stop signal."""
+        kind, _, _, car_make, low_kw, high_kw = self.tasks.get()
+        if kind == STOP_TASK:
+            self.tasks.task_done()
+            return None
+        return None, kind, car_make, low_kw, high_kw
+
+    def finish_task(self, task_id, error=None):
+        """Marks a task taken with `next_task` as done (also when it failed)."""
+        self.tasks.task_done()
+
+    def work(self):
+        """Worker loop: takes tasks until the stop signal, leasing a browser for a task once it needs one."""
+        scraper = None
+        try:
+            while True:
+                task = self.next_task()
+                if task is None:
+                    break
+                task_id, kind, car_make, low_kw, high_kw = task
+                error = None
+                lease = LazyLease(self.driver_pool)
+                try:
+                    scraper = self.attach_driver(scraper, lease)
+                    pages_before = scraper.pages_loaded
+                    try:
+                        if kind == PLAN_TASK:
+                            self.plan_range(
+                                scraper, car_make, low_kw, high_kw)
+                        else:
+                            self.scrape_range(
+                                scraper, car_make, low_kw, high_kw)
+                    finally:
+                        if lease.pooled is not None:
+                            lease.pooled.has_handled_consent = scraper.has_handled_consent
+                            lease.pooled.pages += scraper.pages_loaded - pages_before
+                        scraper.use_driver_source(None)
+                        lease.release()
+                except Exception as e:
+                    error = e
+                    print(f"An error occurred in a crawl task for {car_make}: {e}")
+                finally:
+                    self.finish_task(task_id, error)
+        finally:
+            if scraper:
+                scraper.close()
+
+    def attach_driver(self, scraper, lease):
+        """Points the worker's scraper (created on the first task) at a lazy driver lease."""
+
+        def driver_source():
+            pooled = lease.acquire()
+            return pooled.driver, pooled.has_handled_consent
+
+        if scraper is None:
+            options = dict(driver_source=driver_source, on_links=self.on_links,
+                           capture_search=self.capture_search, on_listing=self.on_listing)
+            if self.database_file:
+                return CarScraperSelenium(self.database_file, **options)
+            return CarScraperSelenium(**options)
+        scraper.use_driver_source(driver_source)
+        return scraper
+
+    def plan_range(self, scraper, car_make, low_kw=None, high_kw=None):
+        """
+        Counts the offers of a make (or of one of its power ranges) and queues a
+        scraping task if they can all be listed, or the next bisection step otherwise.
+        """
+        make_url = scraper.base_category_url + '/' + car_make
+        if low_kw is None:
+            num_offers = scraper.get_number_of_offers(make_url)
+        else:
+            num_offers = scraper.get_number_of_offers(
+                scraper.build_filtered_url(make_url, low_kw, high_kw))
+        if num_offers == 0:
+            if low_kw is None:
+                print(f"No offers for {car_make}, skipping.")
+            return
+        if num_offers is not None and num_offers <= MAX_LISTED_OFFERS:
+            self.put_task(SCRAPE_TASK, num_offers, car_make, low_kw, high_kw)
+            return
+        if low_kw is None:
+            # Too many offers for one listing, bisect the whole power range
+            print(
+                f"Splitting {car_make} into power ranges ({num_offers if num_offers is not None else 'unknown'} offers).")
+            num_offers = num_offers or 0
+            low_kw, high_kw = 1, MAX_POWER_KW
+        elif num_offers is None or low_kw >= high_kw:
+            if num_offers is not None:
+                print(
+                    f"\n!!! {num_offers} offers at {low_kw} kw, only the first {MAX_LISTED_OFFERS} are listed. !!!\n")
+            self.put_task(SCRAPE_TASK, num_offers if num_offers is not None else MAX_LISTED_OFFERS,
+                          car_make, low_kw, high_kw)
+            return
+        middle_kw = (low_kw + high_kw) // 2
+        self.put_task(PLAN_TASK, num_offers, car_make, low_kw, middle_kw)
+        self.put_task(PLAN_TASK, num_offers, car_make, middle_kw + 1, high_kw)
+
+    def scrape_range(self, scraper, car_make, low_kw, high_kw):
+        """Paginates through the offers of a make, optionally within a power range."""
+        make_url = scraper.base_category_url + '/' + car_make
+        if low_kw is None:
+            url = make_url
+            print(f"\n--- Scraping {car_make} ---\n")
+        else:
+            url = scraper.build_filtered_url(make_url, low_kw, high_kw)
+            print(f"\n--- Scraping {car_make} ({low_kw}-{high_kw} kw) ---\n")
+        scraper.start_make(car_make)
+        scraper.get_car_links_paginated(url)
+        scraper.flush_links()
+
+
+class QueueCrawlScheduler(CrawlScheduler):
+    """
+    Crawl scheduler taking its tasks from a shared `WorkQueue` instead of an
+    in-process queue, so the workers of several hosts share one backlog. Tasks are
+    leased one at a time (a task paginates through up to 20 pages, a batch would
+    hold back work from idle workers), acknowledged when done and given back on
+    errors. Leases of crashed workers expire after `visibility_timeout` seconds
+    and are taken over by the remaining workers.
+    """
+
+    def __init__(self, work_queue, car_makes=(), workers=None, database_file=None, max_pages_per_driver=500, on_links=None, visibility_timeout=900, poll_interval=10, on_listing=None):
+        self.work_queue = work_queue
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        super().__init__(car_makes, workers, database_file,
+                         max_pages_per_driver, on_links, on_listing=on_listing)
+
+    def put_task(self, kind, num_offers, car_make, low_kw=None, high_kw=None):
+        """Queues a task in the shared queue, once per key across all hosts."""
+        if kind == PLAN_TASK:
+            key = f"plan:{car_make}:{low_kw}-{high_kw}"
+        else:
+            key = f"scrape:{car_make}:{low_kw}-{high_kw}"
+        payload = {"kind": kind, "make": car_make,
+                   "low_kw": low_kw, "high_kw": high_kw}
+        # Planning first, then the ranges with the most offers
+        self.work_queue.put(CRAWL_QUEUE, [
+            (key, payload, kind * 1000000 - num_offers)])
+
+    def run(self):
+        """Starts the workers and waits until the shared crawl backlog is drained."""
+        print(f"- Using {self.workers} crawl workers.")
+        self.driver_pool = self.create_driver_pool()
+        try:
+            threads = [threading.Thread(target=self.work, daemon=True)
+                       for _ in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self.driver_pool.close()
+
+    def next_task(self):
+        """Leases the next task, waiting while other workers still hold leases. None once drained."""
+        while True:
+            leased = self.work_queue.lease(
+                CRAWL_QUEUE, 1, self.visibility_timeout)
+            if leased:
+                task_id, task = leased[0]
+                return task_id, task["kind"], task["make"], task["low_kw"], task["high_kw"]
+            if self.work_queue.is_drained(CRAWL_QUEUE):
+                return None
+            # Tasks leased elsewhere can still fail or expire, or queue new tasks
+            time.sleep(self.poll_interval)
+
+    def finish_task(self, task_id, error=None):
+        if error is None:
+            self.work_queue.ack([task_id])
+        else:
+            self.work_queue.nack([task_id], delay=60)
+
+
+@contextmanager
+def listing_writer(output_dir):
+    """
+    Yields an `on_listing` callback writing the captured listing summaries into a
+    lite dataset in `output_dir` (shared by all workers), or None without a directory.
+    """
+    if not output_dir:
+        yield None
+        return
+    writer = CarDetailsWriter(output_dir, batch_size=500)
+    lock = threading.Lock()  # The writer is shared by all crawl workers
+
+    def on_listing(record):
+        with lock:
+            writer.add(record)
+
+    try:
+        yield on_listing
+    finally:
+        writer.close()
+        print(f"- {writer.rows_written} listing summaries written to {output_dir}")
+
+
+def crawl_car_links(car_makes, workers=None, database_file=None, on_links=None, power_ranges=None, listings_dir=None):
+    """
+    Crawls the car links of the given makes with the work-stealing scheduler,
+    plus the (make, min kw, max kw, offer count) ranges planned beforehand.
+    With `listings_dir`, the listing summaries are captured into a lite dataset too.
+    """
+    with listing_writer(listings_dir) as on_listing:
+        scheduler = CrawlScheduler(
+            car_makes, workers, database_file, on_links=on_links, power_ranges=power_ranges, on_listing=on_listing)
+        scheduler.run()
+
+
+def crawl_car_links_from_queue(work_queue, car_makes=(), workers=None, database_file=None, on_links=None, listings_dir=None):
+    """
+    Crawls car links from a shared work queue, after queueing a planning task for
+    each of the given makes not queued before. Run it on every host sharing the queue.
+    With `listings_dir`, the listing summaries are captured into a lite dataset too.
+    """
+    with listing_writer(listings_dir) as on_listing:
+        scheduler = QueueCrawlScheduler(
+            work_queue, car_makes, workers, database_file, on_links=on_links, on_listing=on_listing)
+        scheduler.run()
@@ -0,0 +1,182 @@
+from utils.category_page_scraper import extract_car_links, extract_car_cards, extract_number_of_offers, build_page_url, build_filtered_url, plan_power_ranges, RESULTS_PER_PAGE, MAX_RESULT_PAGES, MAX_LISTED_OFFERS
+from utils.parquet_writer import CarDetailsWriter
+from utils.html_parser import parse_html
+from utils.http_session import get_session, REQUEST_TIMEOUT
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import math
+import os
+
+
+# Result pages of a category fetched at the same time
+PAGE_WORKERS = int(os.environ.get("SCRAPER_PAGE_WORKERS", 8))
+
+
+def fetch_category_page(url):
+    """Fetches and parses a server-rendered category page, returning None if the request failed."""
+    try:
+        response = get_session().get(url, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 200:
+            return parse_html(response.content)
+        else:
+            print(f"Failed to retrieve category page: {response.status_code}")
+            return None
+    except Exception as e:
+        print(f"An error occurred while fetching the category page: {e}")
+        return None
+
+
+def fetch_number_of_offers(category_url):
+    """Gets the number of offers of a category over HTTP, or None if it is not on the page."""
+    soup = fetch_category_page(category_url)
+    if soup is None:
+        return None
+    try:
+        return extract_number_of_offers(soup)
+    except ValueError:
+        return None
+
+
+def crawl_category_pages(category_url, workers=PAGE_WORKERS, extract=extract_car_links, retries=1):
+    """
+    Collects the car links of all result pages of a category over HTTP, building the
+    `page=` URLs directly and fetching the pages after the first one in parallel.
+    Returns the links per page, with None for a page that still failed after
+    `retries` more attempts (so the caller can fall back for that page only), or
+    None if the category could not be crawled without a browser at all (first
+    page failed or not server-rendered). Pass another `extract(soup, base_url)`
+    (e.g. `extract_car_cards`) to collect something else per page.
+    """
+    parts = urlsplit(category_url)
+    base_url = f"{parts.scheme}://{parts.netloc}"
+
+    first_page = fetch_category_page(build_page_url(category_url, 1))
+    for _ in range(retries):
+        if first_page is not None:
+            break
+        first_page = fetch_category_page(build_page_url(category_url, 1))
+    if first_page is None:
+        return None
+    try:
+        num_offers = extract_number_of_offers(first_page)
+    except ValueError:
+        num_offers = None
+    first_links = extract(first_page, base_url)
+    if num_offers is None or (num_offers > 0 and not first_links):
+        return None  # Not server-rendered (or blocked)
+
+    num_pages = min(MAX_RESULT_PAGES, math.ceil(num_offers / RESULTS_PER_PAGE))
+    page_urls = [build_page_url(category_url, page)
+                 for page in range(2, num_pages + 1)]
+
+    def fetch_page(number, url):
+        for _ in range(retries + 1):
+            soup = fetch_category_page(url)
+            if soup is not None:
+                items = extract(soup, base_url)
+                # An empty page before the last one was blocked rather than rendered
+                if items or number == num_pages:
+                    return items
+        print(f"Could not crawl page {number} of {category_url}.")
+        return None
+
+    pages = [first_links]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pages.extend(executor.map(fetch_page, range(2, num_pages + 1), page_urls))
+    return pages
+
+
+def write_lite_pages(writer, car_make, category_url, pages=None):
+    """
+    Writes the card records of all result pages of a category, or only of the
+    given page numbers. Returns the page numbers that failed, or None if the
+    whole category could not be crawled.
+    """
+    if pages is None:
+        results = crawl_category_pages(category_url, extract=extract_car_cards)
+        if results is None:
+            return None
+        numbered = enumerate(results, start=1)
+    else:
+        parts = urlsplit(category_url)
+        base_url = f"{parts.scheme}://{parts.netloc}"
+        numbered = []
+        for page in pages:
+            soup = fetch_category_page(build_page_url(category_url, page))
+            numbered.append((page, extract_car_cards(soup, base_url) if soup is not None else None))
+    failed_pages = []
+    for page, records in numbered:
+        if records is None:
+            failed_pages.append(page)
+            continue
+        for record in records:
+            record["make"] = car_make
+            writer.add(record)
+    return failed_pages
+
+
+def scrape_lite_make(writer, car_make, make_url):
+    """
+    Writes the card records of a make, split into power ranges where needed.
+    Returns its failures as (make, category URL, failed page numbers or None
+    if the whole category failed).
+    """
+    num_offers = fetch_number_of_offers(make_url)
+    if num_offers is None:
+        print(f"Could not get the number of offers for {car_make}.")
+        return [(car_make, make_url, None)]
+    if num_offers == 0:
+        return []
+    if num_offers <= MAX_LISTED_OFFERS:
+        category_urls = [make_url]
+    else:
+        category_urls = [build_filtered_url(make_url, low_kw, high_kw) for low_kw, high_kw, _ in
+                         plan_power_ranges(make_url, fetch_number_of_offers)]
+    rows_before = writer.rows_written + len(writer.buffer)
+    failures = []
+    for category_url in category_urls:
+        failed_pages = write_lite_pages(writer, car_make, category_url)
+        if failed_pages is None:
+            print(f"Could not crawl {category_url}.")
+        if failed_pages is None or failed_pages:
+            failures.append((car_make, category_url, failed_pages))
+    print(
+        f"{writer.rows_written + len(writer.buffer) - rows_before} records from {num_offers} offers.")
+    return failures
+
+
+def scrape_lite_car_details(car_makes, output_dir="lite_car_details", base_category_url="https://www.autoscout24.com/lst"):
+    """
+    Lite crawl: builds partial car records from the result cards of every make
+    (split into power ranges where needed) and streams them into a partitioned
+    Parquet dataset, without fetching any detail page. Makes, ranges and pages
+    that failed are retried once at the end; the ones still failing are reported
+    and returned as (make, category URL, failed page numbers or None).
+    """
+    writer = CarDetailsWriter(output_dir, batch_size=500)
+    failures = []
+    try:
+        for i, car_make in enumerate(car_makes, start=1):
+            print(f"\n--- Lite scraping make {i}/{len(car_makes)}: {car_make} ---")
+            failures.extend(scrape_lite_make(
+                writer, car_make, base_category_url + '/' + car_make))
+        if failures:
+            print(f"\n--- Retrying {len(failures)} failed makes and ranges ---")
+            retried = failures
+            failures = []
+            for car_make, category_url, pages in retried:
+                make_url = base_category_url + '/' + car_make
+                if category_url == make_url and pages is None:
+                    failures.extend(scrape_lite_make(writer, car_make, make_url))
+                    continue
+                failed_pages = write_lite_pages(writer, car_make, category_url, pages)
+                if failed_pages is None or failed_pages:
+                    failures.append((car_make, category_url, failed_pages))
+    finally:
+        writer.close()
+    print(f"\n- Total records written: {writer.rows_written}")
+    if failures:
+        print(f"\n!!! {len(failures)} makes or ranges are incomplete: !!!")
+        for car_make, category_url, pages in failures:
+            print(f"- {car_make}: {category_url} ({'all pages' if pages is None else f'pages {pages}'})")
+    return failures
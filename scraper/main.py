@@ -1,6 +1,11 @@
 from selenium_scraper import CarScraperSelenium
-from requests_scraper import scrape_make_car_details, scrape_all_car_details
-from concurrent.futures import ProcessPoolExecutor
+from requests_scraper import scrape_make_car_details, scrape_all_car_details, reextract_car_details_from_archive
+from utils.consolidate_car_links import consolidate_car_links
+from crawl_scheduler import crawl_car_links
+from http_category_crawler import scrape_lite_car_details
+from streaming_pipeline import stream_car_details
+from cli import run_cli
+import sys
 import os
 
 
@@ -10,14 +15,12 @@ def parallel_scrape_car_links():
         print("\nProceeding with parallel scraping...\n")
         print("- Setting up parallel scrapers...")
         max_workers = int(os.cpu_count() * 0.8)
-        print(f"- Using {max_workers} workers for parallel scraping.")
         # Read car makes from file
         with open('./car_make_metadata/car_makes.txt', 'r') as f:
             car_makes = f.read().splitlines()
         print(f"- Car makes loaded from file.")
-        with ProcessPoolExecutor(max_workers=max_workers) as executor:
-            for _ in executor.map(handle_parallel_scrape_car_make, car_makes):
-                pass  # Wait for all processes to complete
+        # Makes are split into (make, power range) tasks, shared by all workers
+        crawl_car_links(car_makes, max_workers)
     except Exception as e:
         print(f"An error occurred during parallel scraping: {e}")
         exit(1)
@@ -25,17 +28,6 @@ def parallel_scrape_car_links():
         print("\n--- Parallel scraping completed. ---\n")
 
 
-def handle_parallel_scrape_car_make(car_make):
-    """Function to scrape car make in parallel."""
-    scraper = CarScraperSelenium()
-    try:
-        print(f"\n--- Starting scraping for {car_make} ---\n")
-        scraper.get_car_make_links_parallel(car_make)
-        print(f"\n--- Finished scraping for {car_make} ---\n")
-    finally:
-        scraper.close()
-
-
 def singular_scrape_car_links():
     print("\nProceeding with single-threaded scraping...\n")
     singular = input("Do you want to scrape a single car make? (y/n): ")
@@ -56,33 +48,26 @@ def singular_scrape_car_links():
             scraper.get_car_links_single_make_from_kw(car_make, from_kw)
         else:
             scraper.get_car_links()
-        print(f"\nFound {len(scraper.car_links)} car links.")
-        print("Last 5 car links: ", scraper.car_links[-5:])
+        print(f"\nFound {scraper.links_found} car links.")
     except KeyboardInterrupt:
         print(
             "\n!!! KeyboardInterrupt detected. Saving car links before exiting... !!!\n")
     finally:
         try:
-            # Write the car links to a file
-            if (car_make):
-                with open(f"car_links_{car_make}.txt", 'w') as f:
-                    for link in scraper.car_links:
-                        f.write(link + '\n')
-                print(
-                    f"\nCar links saved to {car_make}_links.txt\n")
-            else:
-                with open('car_links.txt', 'w') as f:
-                    for link in scraper.car_links:
-                        f.write(link + '\n')
-                print("\nCar links saved to car_links.txt\n")
+            # Commits the links of the last pages, earlier pages are already in the link store
+            scraper.close()
+            print(
+                f"\nCar links saved to {scraper.database_file} ({scraper.links_added} new)\n")
         except Exception as e:
             print(
                 f"\n!!! An error occurred while saving car links: {e} !!!\n")
-        finally:
-            scraper.close()
 
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # Non-interactive run, e.g. `python main.py details --shard 0/4`
+        run_cli(sys.argv[1:])
+        exit(0)
     print("""
     ___         __                              __     _____                                
    /   | __  __/ /_____  ______________  __  __/ /_   / ___/______________ _____  ___  _____
@@ -92,7 +77,7 @@ if __name__ == '__main__':
                                                                         /_/                 """)
     print("Welcome!\n")
     option = input(
-        "What do you want to do?\n\n1. Scrape car links (requires selenium with driver)\n2. Scrape car details\n3. Consolidate car links\n4. Exit\n\nEnter your choice: ")
+        "What do you want to do?\n\n1. Scrape car links (requires selenium with driver)\n2. Scrape car details\n3. Consolidate car links\n4. Re-extract car details from the HTML archive\n5. Lite scrape (partial records from result pages only)\n6. Scrape car links and details in one streaming pipeline\n7. Exit\n\nEnter your choice: ")
     if option == '1':
         print("\n--- Scraping car links ---\n")
         parallel = input("Do you want to scrape in parallel? (y/n): ")
@@ -111,7 +96,7 @@ if __name__ == '__main__':
             scrape_make_car_details(make)
         elif singular_make.lower() == 'n':
             print(
-                "\n--- This will consolidate details in the file 'all_car_links.parquet' ---")
+                "\n--- This will write the details into the partitioned dataset 'all_car_details/' ---")
             make = input(
                 "Enter the car make to scrape details starting from (or leave blank to scrape all): ")
             if make:
@@ -122,10 +107,27 @@ if __name__ == '__main__':
             print("\n!!! Invalid input. Exiting... !!!\n")
             exit(1)
     elif option == '3':
-        print("\n--- Consolidating car links ---\n")
-        print("\n!!! Consolidating car links is not yet implemented. Exiting... !!!\n")
-        exit(1)
+        # Only needed for link files of older crawls, the crawler writes to the link store directly
+        print("\n--- Consolidating car links into the link store ---\n")
+        directory = input(
+            "Enter the directory of the '[make]_links.txt' files (or leave blank for 'car_links'): ")
+        consolidate_car_links(directory or "car_links")
     elif option == '4':
+        print("\n--- Re-extracting car details from the HTML archive ---\n")
+        directory = input(
+            "Enter the archive directory (or leave blank for 'html_archive'): ")
+        reextract_car_details_from_archive(directory or "html_archive")
+    elif option == '5':
+        print("\n--- Lite scraping into the partitioned dataset 'lite_car_details/' ---\n")
+        with open('./car_make_metadata/car_makes.txt', 'r') as f:
+            car_makes = f.read().splitlines()
+        scrape_lite_car_details(car_makes)
+    elif option == '6':
+        print("\n--- Streaming car links into detail scraping, writing 'all_car_details/' ---\n")
+        with open('./car_make_metadata/car_makes.txt', 'r') as f:
+            car_makes = f.read().splitlines()
+        stream_car_details(car_makes, int(os.cpu_count() * 0.8))
+    elif option == '7':
         print("\nExiting...\n")
         exit(0)
 
@@ -1,36 +1,43 @@
-from utils.car_details_scraper import scrape_car_details_from_soup
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup
+from utils.car_details_scraper import scrape_car_record_from_html, scrape_car_records_from_pages
+from utils.http_session import get_session, REQUEST_TIMEOUT
+from utils.html_archive import HtmlArchive, archive_page, extract_archived_pages
+from utils.listing_state import get_listing_state
+from utils.progress_journal import ProgressJournal
+from utils.parquet_writer import CarDetailsWriter
+from utils.link_store import LinkStore, StoredLinks, LINK_STORE_FILE
+from utils.work_queue import CRAWL_QUEUE, DETAILS_QUEUE
+from async_scraper import scrape_car_details_async
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
 import pandas as pd
-import requests
-import json
+import threading
+import asyncio
+import queue
+import time
 import os
 
 
-def read_car_links_from_file(file_path="../all_car_links.json"):
-    """Reads car links from the `all_car_links.json` file"""
-    try:
-        with open(file_path, "r") as file:
-            data = json.load(file)
-            return data
-    except FileNotFoundError:
-        print(f"File not found: {file_path}")
-        return {}
-    except json.JSONDecodeError:
-        print(f"Error decoding JSON from file: {file_path}")
-        return {}
-    except Exception as e:
-        print(f"An error occurred while reading the file: {e}")
-        return {}
+# Returned for an unchanged page (HTTP 304 in incremental mode) when asked to tell it apart from a failure
+UNCHANGED = object()
 
 
-def scrape_car_details_from_url(url, make):
-    """Scrapes car details from a URL, returning a tuple of car details."""
+def fetch_car_page(url, make=None, unchanged=None):
+    """
+    Fetches the raw HTML of a detail page (archiving it if switched on), returning
+    None if the request failed or, in incremental mode, `unchanged` if the page is
+    unchanged (None too, unless asked otherwise).
+    """
     try:
-        response = requests.get(url)
+        state = get_listing_state()
+        headers = state.conditional_headers(url) if state else {}
+        response = get_session().get(url, timeout=REQUEST_TIMEOUT, headers=headers)
+        if response.status_code == 304:
+            return unchanged  # Not modified since the last run
         if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            return {"url": url, "make": make} | scrape_car_details_from_soup(soup)
+            archive_page(url, response.content, make)
+            if state:
+                state.record_fetch(url, make, response.headers.get(
+                    "ETag"), response.headers.get("Last-Modified"))
+            return response.content
         else:
             print(f"Failed to retrieve page: {response.status_code}")
             return None
@@ -39,69 +46,196 @@ def scrape_car_details_from_url(url, make):
         return None
 
 
-def scrape_car_details_by_make(make):
-    """Scrape car details of a single car make."""
-    links = read_car_links_from_file()
-    if make in links:
-        try:
-            car_links = links[make]
-            print(f"\n--- Found {len(car_links)} links for make: {make} ---\n")
-            car_details_list = []
-
-            i = 1
-            for link in car_links:
-                details = scrape_car_details_from_url(link, make)
-                if details:
-                    car_details_list.append(details)
-                print(f"-> {i}/{len(car_links)}", end="\r")
-                i += 1
-            print("\nCar details scraped successfully for make:", make)
-            print(f"- Total car details scraped: {len(car_details_list)}")
-            print(
-                f"- Missed car details: {len(car_links) - len(car_details_list)}")
-            return car_details_list
+def scrape_car_details_from_url(url, make, unchanged=None):
+    """Scrapes car details from a URL, returning a tuple of car details, None on errors or `unchanged` for an unchanged page."""
+    html = fetch_car_page(url, make, unchanged)
+    if html is None or html is unchanged:
+        return html
+    try:
+        return scrape_car_record_from_html(html, url, make)
+    except Exception as e:
+        print(f"An error occurred while parsing the page: {e}")
+        return None
 
-        except Exception as e:
-            print(
-                f"\n!!! An error occurred while scraping car details: {e} !!!\n")
 
-    else:
+def get_make_links(make, car_links=None):
+    """Returns the given links, or the links of the make streamed from the link store."""
+    if car_links is not None:
+        return car_links
+    car_links = StoredLinks(make)
+    if not car_links:
         print(f"No links found for make: {make} \nDoes this brand exist?")
         exit(1)
+    return car_links
 
 
-def parallel_scrape_car_details_by_make(make):
-    """Scrape car details of a single car make in parallel using threads."""
-    links = read_car_links_from_file()
-    if make not in links:
-        print(f"No links found for make: {make} \nDoes this brand exist?")
-        exit(1)
+def scrape_car_details_by_make(make, car_links=None, on_result=None):
+    """
+    Scrape car details of a single car make. Every mode takes the links to scrape
+    (all links of the make by default) and an optional `on_result` callback,
+    called in the calling thread with each scraped record as it arrives. With a
+    callback the records are streamed to it instead of being collected.
+    """
+    car_links = get_make_links(make, car_links)
+    try:
+        print(f"\n--- Found {len(car_links)} links for make: {make} ---\n")
+        car_details_list = []
+        scraped = 0
 
-    car_links = links[make]
+        i = 1
+        for link in car_links:
+            details = scrape_car_details_from_url(link, make)
+            if details:
+                scraped += 1
+                if on_result:
+                    on_result(details)
+                else:
+                    car_details_list.append(details)
+            print(f"-> {i}/{len(car_links)}", end="\r")
+            i += 1
+        print("\nCar details scraped successfully for make:", make)
+        print(f"- Total car details scraped: {scraped}")
+        print(
+            f"- Missed car details: {len(car_links) - scraped}")
+        return car_details_list
+
+    except Exception as e:
+        print(
+            f"\n!!! An error occurred while scraping car details: {e} !!!\n")
+
+
+def parallel_scrape_car_details_by_make(make, car_links=None, on_result=None):
+    """Scrape car details of a single car make in parallel using threads."""
+    car_links = get_make_links(make, car_links)
     print(f"\n--- Found {len(car_links)} links for make: {make} ---\n")
     car_details_list = []
+    scraped = 0
 
     # For network-bound tasks, you might allow more threads than CPU cores.
     max_workers = os.cpu_count() * 4  # for example, trying twice the CPU count
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all requests concurrently.
-        futures = {executor.submit(
-            scrape_car_details_from_url, link, make): link for link in car_links}
-        for i, future in enumerate(as_completed(futures), start=1):
+    processed = 0
+    pending = set()
+
+    def collect(done):
+        nonlocal scraped, processed
+        for future in done:
             details = future.result()
             if details:
-                car_details_list.append(details)
-            print(f"-> {i}/{len(car_links)} processed", end="\r")
+                scraped += 1
+                if on_result:
+                    on_result(details)
+                else:
+                    car_details_list.append(details)
+            processed += 1
+            print(f"-> {processed}/{len(car_links)} processed", end="\r")
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Submit the links as they are read, keeping a bounded number in flight
+        for link in car_links:
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(scrape_car_details_from_url, link, make))
+        done, pending = wait(pending)
+        collect(done)
+    print("\nCar details scraped successfully for make:", make)
+    print(f"- Total car details scraped: {scraped}")
+    print(f"- Missed car details: {len(car_links) - scraped}")
+    return car_details_list
+
+
+def pipelined_scrape_car_details_by_make(make, car_links=None, on_result=None, fetch_workers=None, parse_workers=None, batch_size=25):
+    """
+    Scrape car details of a single car make in two stages: I/O threads fetch the
+    raw pages onto a bounded queue, and a process pool parses them in batches,
+    so parsing scales with the cores instead of contending for the GIL.
+    """
+    car_links = get_make_links(make, car_links)
+    print(f"\n--- Found {len(car_links)} links for make: {make} ---\n")
+    fetch_workers = fetch_workers or os.cpu_count() * 4
+    parse_workers = parse_workers or os.cpu_count()
+    # The fetchers share one iterator, so the links are read as they are fetched
+    links = iter(car_links)
+    links_lock = threading.Lock()
+    page_queue = queue.Queue(maxsize=batch_size * parse_workers * 2)
+
+    def fetch_worker():
+        while True:
+            with links_lock:
+                url = next(links, None)
+            if url is None:
+                break
+            page_queue.put((url, fetch_car_page(url, make)))
+
+    car_details_list = []
+    scraped = 0
+    processed = 0
+    pending = set()
+
+    def collect(done):
+        nonlocal scraped
+        for future in done:
+            try:
+                records = future.result()
+            except Exception as e:
+                print(f"\n!!! An error occurred while parsing a batch: {e} !!!\n")
+                continue
+            scraped += len(records)
+            if on_result:
+                for details in records:
+                    on_result(details)
+            else:
+                car_details_list.extend(records)
+
+    with ThreadPoolExecutor(max_workers=fetch_workers) as fetchers, \
+            ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+        for _ in range(fetch_workers):
+            fetchers.submit(fetch_worker)
+
+        batch = []
+        while processed < len(car_links):
+            url, html = page_queue.get()
+            processed += 1
+            if html is not None:
+                batch.append((url, html))
+            if batch and (len(batch) >= batch_size or processed == len(car_links)):
+                # Keep a bounded number of batches in flight
+                if len(pending) >= parse_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                pending.add(parsers.submit(
+                    scrape_car_records_from_pages, batch, make))
+                batch = []
+            print(f"-> {processed}/{len(car_links)} fetched", end="\r")
+        done, pending = wait(pending)
+        collect(done)
+
     print("\nCar details scraped successfully for make:", make)
-    print(f"- Total car details scraped: {len(car_details_list)}")
-    print(f"- Missed car details: {len(car_links) - len(car_details_list)}")
+    print(f"- Total car details scraped: {scraped}")
+    print(f"- Missed car details: {len(car_links) - scraped}")
+    return car_details_list
+
+
+def async_scrape_car_details_by_make(make, car_links=None, on_result=None):
+    """Scrape car details of a single car make with the asyncio engine."""
+    car_links = get_make_links(make, car_links)
+    print(f"\n--- Found {len(car_links)} links for make: {make} ---\n")
+    car_details_list, scraped = asyncio.run(
+        scrape_car_details_async(car_links, make, on_result=on_result))
+    print("\nCar details scraped successfully for make:", make)
+    print(f"- Total car details scraped: {scraped}")
+    print(f"- Missed car details: {len(car_links) - scraped}")
     return car_details_list
 
 
 def scrape_make_car_details(make):
     """Scrape car details of a single car make."""
-    links = read_car_links_from_file()
-    if make in links:
+    store = LinkStore()
+    try:
+        make_exists = store.has_make(make)
+    finally:
+        store.close()
+    if make_exists:
         car_details_list = scrape_car_details_by_make(make)
         df = pd.DataFrame(car_details_list)
         print(df.head())
@@ -114,58 +248,212 @@ def scrape_make_car_details(make):
         exit(1)
 
 
-def scrape_all_car_details(start_from=None):
-    """Scrape car details from urls for all cars, by make, optionally starting from a specific make."""
-    links = read_car_links_from_file()
+def scrape_all_car_details(start_from=None, mode=None, journal_file="scrape_progress.db", output_dir="all_car_details", shard=None, link_store_file=LINK_STORE_FILE):
+    """
+    Scrape car details from urls for all cars, by make, optionally starting from a specific make.
+    Records are streamed into the partitioned `output_dir` dataset and progress is
+    journaled per URL, so a rerun after a crash resumes where it stopped.
+    With a `shard`, only the URLs hashed to that shard are scraped, so every shard
+    must read the same (merged) link store.
+    """
+    store = LinkStore(link_store_file)
+    makes = store.makes()
     i = 0
-    total = 0
     if start_from:
         try:
-            start_index = list(links.keys()).index(start_from)
-            links = dict(list(links.items())[start_index:])
+            start_index = makes.index(start_from)
+            makes = makes[start_index:]
         except ValueError:
             print(f"Make {start_from} not found in the list.")
+            store.close()
             exit(1)
     else:
         start_index = 0
-    parralel = None
-    while parralel not in ["y", "Y", "n", "N"]:
-        parralel = input(
-            "Do you want to scrape car details in parallel? (y/n): ")
-    if parralel in ["y", "Y"]:
-        parallel = True
-    else:
-        parallel = False
-    for make in list(links.keys()):
-        print(f"\n--- Scraping car details for make: {make} ---")
-        print(f"{i}/{len(list(links.keys()))} makes done\n")
-        if parallel:
-            print("Scraping in parallel...")
-            car_details_list = parallel_scrape_car_details_by_make(make)
-        else:
-            print("Scraping sequentially...")
-            car_details_list = scrape_car_details_by_make(make)
-        df = pd.DataFrame(car_details_list)
-        append_to_consolidated_parquet(df)
-        i += 1
-        total += len(car_details_list)
+    while mode not in DETAIL_SCRAPING_MODES:
+        mode = input(
+            f"How do you want to scrape car details? ({'/'.join(DETAIL_SCRAPING_MODES)}): ").lower()
+    scrape_by_make = DETAIL_SCRAPING_MODES[mode]
+    journal = ProgressJournal(journal_file)
+    state = get_listing_state()
+    # In incremental mode only the listings whose record changed are written
+
+    def on_flush(records):
+        # Only once the records are on disk, so a failed write is retried on the next run
+        if state:
+            state.record_saved(records)
+        journal.add_batch(records)
+
+    writer = CarDetailsWriter(output_dir, batch_size=500, on_flush=on_flush,
+                              filter_records=state.filter_changed if state else None)
+    try:
+        for make in makes:
+            print(f"\n--- Scraping car details for make: {make} ---")
+            print(f"{i}/{len(makes)} makes done\n")
+            if journal.is_make_done(make):
+                print("Already saved in an earlier run, skipping...")
+                i += 1
+                continue
+            completed = journal.completed_urls(make)
+            # Streamed from the make's cursor, only this make's links are held in memory
+            car_links = [link for link in store.iter_links(
+                make) if link not in completed and (shard is None or shard.owns(link))]
+            if completed:
+                print(
+                    f"Resuming: {len(completed)} links already scraped, {len(car_links)} left.")
+            print(f"Scraping in {mode} mode...")
+            rows_before = writer.rows_written
+            scrape_by_make(make, car_links, on_result=writer.add)
+            writer.flush()
+            journal.finish_make(make)
+            print(
+                f"Wrote {writer.rows_written - rows_before} rows to {output_dir}; new total: {writer.rows_written} rows.\n")
+            i += 1
+        journal.reset()
+    finally:
+        # Keeps the records scraped so far, also when interrupted
+        writer.close()
+        journal.close()
+        store.close()
     print(f"--- \nAll car details scraped successfully.\n ---")
-    print(f"- Total car details scraped: {total}")
+    print(f"- Total car details written: {writer.rows_written}")
+
+
+# Mode name -> function scraping the car details of a single make
+DETAIL_SCRAPING_MODES = {
+    "sequential": scrape_car_details_by_make,
+    "threads": parallel_scrape_car_details_by_make,
+    "pipeline": pipelined_scrape_car_details_by_make,
+    "async": async_scrape_car_details_by_make,
+}
+
 
+def queue_detail_links(work_queue, make, links):
+    """Queues detail tasks for the links of a make, skipping URLs queued before. Returns the number of new tasks."""
+    return work_queue.put(DETAILS_QUEUE, [
+        (link, {"url": link, "make": make}, 0) for link in links])
 
-def append_to_consolidated_parquet(new_df, consolidated_file="all_car_details.parquet"):
+
+def queue_stored_links(work_queue):
+    """Queues detail tasks for all links in the link store."""
+    store = LinkStore()
+    try:
+        for make in store.makes():
+            added = queue_detail_links(work_queue, make, store.iter_links(make))
+            print(f"- {make}: {added} new detail tasks")
+    finally:
+        store.close()
+
+
+def scrape_car_details_from_queue(work_queue, workers=None, batch_size=50, visibility_timeout=300, output_dir="all_car_details", follow=False, retry_delay=60, poll_interval=5):
     """
-    Appends new_df to an existing consolidated Parquet file by reading
-    the current file, concatenating, and re-saving.
+    Scrapes the detail tasks of a shared work queue, on any number of hosts at once.
+    Every worker thread leases a batch of URLs at a time; unchanged pages are
+    acknowledged right away, the others once their record is flushed to the
+    partitioned `output_dir` dataset, so the tasks of a crashed worker are redone
+    from the queue after their lease expires. Failed URLs are given back for a
+    retry after `retry_delay` seconds (until the queue gives them up). The writer
+    is flushed early when its oldest record was buffered for half the visibility
+    timeout, before the lease runs out. The workers stop once the detail queue is
+    drained and no crawl tasks are left to queue more, or never with `follow`.
     """
-    if os.path.exists(consolidated_file):
-        # Read existing data
-        existing_df = pd.read_parquet(consolidated_file)
-        # Concatenate new data
-        combined_df = pd.concat([existing_df, new_df], ignore_index=True)
-    else:
-        combined_df = new_df
-    # Save back to Parquet
-    combined_df.to_parquet(consolidated_file, index=False)
+    workers = workers or os.cpu_count() * 4
+    lock = threading.Lock()  # Guards the writer and the unacknowledged tasks
+    unacknowledged = {}  # URL -> task ID of the records buffered in the writer
+    buffered_since = [None]  # Lease time of the oldest buffered record
+    processed = [0]
+    state = get_listing_state()
+
+    def acknowledge_written(records):
+        if state:
+            state.record_saved(records)
+        work_queue.ack([unacknowledged.pop(record["url"]) for record in records
+                        if record["url"] in unacknowledged])
+        buffered_since[0] = None
+
+    writer = CarDetailsWriter(output_dir, batch_size=500, on_flush=acknowledge_written,
+                              filter_records=state.filter_changed if state else None)
+
+    def detail_worker():
+        while True:
+            tasks = work_queue.lease(DETAILS_QUEUE, batch_size, visibility_timeout)
+            if not tasks:
+                # Acknowledge the buffered records before waiting, so their leases do not expire
+                with lock:
+                    writer.flush()
+                if not follow and work_queue.is_drained(DETAILS_QUEUE) and work_queue.is_drained(CRAWL_QUEUE):
+                    break
+                time.sleep(poll_interval)
+                continue
+            leased_at = time.time()
+            done = []
+            failed = []
+            for task_id, task in tasks:
+                try:
+                    details = scrape_car_details_from_url(
+                        task["url"], task["make"], unchanged=UNCHANGED)
+                except Exception as e:
+                    print(f"An error occurred while scraping {task['url']}: {e}")
+                    details = None
+                with lock:
+                    processed[0] += 1
+                    if details is UNCHANGED:
+                        done.append(task_id)
+                    elif details:
+                        unacknowledged[task["url"]] = task_id
+                        if buffered_since[0] is None:
+                            buffered_since[0] = leased_at
+                        writer.add(details)
+                    else:
+                        failed.append(task_id)
+            work_queue.ack(done)
+            work_queue.nack(failed, delay=retry_delay)
+            with lock:
+                if buffered_since[0] is not None and time.time() - buffered_since[0] > visibility_timeout / 2:
+                    writer.flush()
+            print(f"-> {processed[0]} detail tasks processed", end="\r")
+
+    threads = [threading.Thread(target=detail_worker, daemon=True)
+               for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    finally:
+        with lock:
+            writer.close()
+    print(f"\n- Total car details written: {writer.rows_written}")
+    print(f"- Detail tasks: {work_queue.counts(DETAILS_QUEUE)}")
+
+
+def reextract_car_details_from_archive(directory="html_archive", output_dir="reextracted_car_details", make=None, parse_workers=None, batch_size=100):
+    """
+    Runs the extractors over the latest archived page of every URL in parallel,
+    without any network requests, and streams the records into a partitioned dataset.
+    """
+    archive = HtmlArchive(directory)
+    writer = CarDetailsWriter(output_dir)
+    parse_workers = parse_workers or os.cpu_count()
+    try:
+        with ProcessPoolExecutor(max_workers=parse_workers) as executor:
+            futures = []
+            batch = []
+            for entry in archive.latest_pages(make):
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    futures.append(executor.submit(
+                        extract_archived_pages, directory, batch))
+                    batch = []
+            if batch:
+                futures.append(executor.submit(
+                    extract_archived_pages, directory, batch))
+            for i, future in enumerate(as_completed(futures), start=1):
+                for details in future.result():
+                    writer.add(details)
+                print(f"-> {i}/{len(futures)} batches re-extracted", end="\r")
+    finally:
+        writer.close()
+        archive.close()
     print(
-        f"Appended {len(new_df)} rows; new total: {len(combined_df)} rows.\n")
+        f"\nRe-extracted {writer.rows_written} car details into {output_dir}\n")
+    return writer.rows_written
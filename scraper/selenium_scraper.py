@@ -1,25 +1,49 @@
-from utils.selenium_scraper_setup import setup_selenium_driver, get_page_source, parse_html
+from utils.selenium_scraper_setup import setup_selenium_driver, get_page_source, parse_html, wait_for_results, read_results_page, wait_for_pagination, capture_search_responses, read_embedded_search_data, CAPTURE_SEARCH_RESPONSES
+from utils.search_listing_scraper import scrape_search_listings
 from utils.car_details_scraper import scrape_car_title, scrape_price, scrape_fuel_type
-from utils.category_page_scraper import extract_car_links
+from utils.category_page_scraper import extract_car_links, car_links_from_hrefs, parse_number_of_offers, plan_power_ranges, build_filtered_url, build_page_url, MAX_LISTED_OFFERS, MAX_POWER_KW, RESULTS_PER_PAGE
+from http_category_crawler import crawl_category_pages, fetch_number_of_offers
+from utils.link_store import LinkStore, LINK_STORE_FILE
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
-from urllib.parse import urlencode, urljoin
-import sqlite3
 import random
-import time
 
 
 class CarScraperSelenium:
-    def __init__(self, database_file='car_listings.db', base_url="https://www.autoscout24.com"):
-        """Initializes the CarScraper with a database connection and base URL."""
+    def __init__(self, database_file=LINK_STORE_FILE, base_url="https://www.autoscout24.com", commit_every_pages=5, driver=None, http_first=True, capture_search=CAPTURE_SEARCH_RESPONSES, on_listing=None, on_links=None, driver_source=None):
+        """
+        Initializes the CarScraper with a database connection and base URL. Starts
+        its own Selenium driver on first use, unless a driver is given or
+        `driver_source` returns one (with its consent state) when first needed,
+        e.g. leased from a `DriverPool`. With `http_first`, category pages are
+        fetched over plain HTTP and the browser is only used (and started) for the
+        pages where that fails. With `capture_search`, pages are
+        loaded in the browser and the listing summaries of the search responses
+        are passed to `on_listing` (the driver must record its network events).
+        `on_links` is called with the make and the links of every scraped page.
+        """
         self.database_file = database_file
         self.base_url = base_url
-        self.conn = sqlite3.connect(self.database_file)
+        self.link_store = LinkStore(self.database_file)
+        self.conn = self.link_store.conn
         self.cursor = self.conn.cursor()
         self.create_table()  # Ensure the table exists
-        self.driver = setup_selenium_driver()  # Initialize the Selenium Driver
-        self.car_links = []  # List to store car links
+        self.owns_driver = False
+        self._driver = driver  # Started or leased on first use, see `driver`
+        self.driver_source = driver_source
+        self.pages_loaded = 0  # Pages loaded by this scraper, across drivers
+        self.http_first = http_first
+        self.capture_search = capture_search
+        self.on_listing = on_listing  # Optional: called with each captured listing summary
+        self.on_links = on_links  # Optional: called with the make and links of each page
+        self.listings_captured = 0
+        self.current_make = None  # Make of the links being scraped
+        self.pending_links = []  # Links of the pages not yet committed
+        self.pending_pages = 0
+        self.commit_every_pages = commit_every_pages
+        self.links_found = 0  # Links found in this session
+        self.links_added = 0  # Links that were new to the link store
         self.has_handled_consent = False  # Flag to check if consent has been handled
         self.user_agents = [
             "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
@@ -41,6 +65,62 @@ class CarScraperSelenium:
                                     "userAgent": new_user_agent})
         print(f"\n-- User-Agent rotated to: {new_user_agent} --\n")
 
+    @property
+    def driver(self):
+        """The Selenium driver, only started (or taken from `driver_source`) when a page needs the browser."""
+        if self._driver is None:
+            if self.driver_source:
+                self._driver, self.has_handled_consent = self.driver_source()
+            else:
+                self._driver = setup_selenium_driver()  # Initialize the Selenium Driver
+                self.owns_driver = True
+        return self._driver
+
+    def use_driver(self, driver, has_handled_consent=False):
+        """Switches to another (e.g. pooled) driver, which is not quit on close."""
+        self.release_driver()
+        self._driver = driver
+        self.has_handled_consent = has_handled_consent
+
+    def use_driver_source(self, driver_source):
+        """Switches to drivers returned by `driver_source` on first use, e.g. a lazy pool lease."""
+        self.release_driver()
+        self.driver_source = driver_source
+
+    def release_driver(self):
+        """Drops the current driver, quitting it if this scraper started it."""
+        if self.owns_driver and self._driver is not None:
+            self._driver.quit()
+        self._driver = None
+        self.owns_driver = False
+
+    def create_table(self):
+        """Creates the car links table of the link store if it does not exist."""
+        self.link_store.create_table()
+
+    def save_page_links(self, links):
+        """Buffers the links of a scraped page, committing them every `commit_every_pages` pages."""
+        self.pending_links.extend(links)
+        self.pending_pages += 1
+        self.links_found += len(links)
+        if self.on_links:
+            self.on_links(self.current_make, links)
+        if self.pending_pages >= self.commit_every_pages:
+            self.flush_links()
+
+    def flush_links(self):
+        """Commits the buffered links to the link store in one batch."""
+        if self.pending_links:
+            self.links_added += self.link_store.add_links(
+                self.current_make, self.pending_links)
+        self.pending_links = []
+        self.pending_pages = 0
+
+    def start_make(self, car_make):
+        """Commits the links of the previous make and starts collecting links for the next."""
+        self.flush_links()
+        self.current_make = car_make
+
     def handle_consent_popup(self):
         """Handles the consent popup by declining cookies, must be done once per session."""
         # Handle the consent popup
@@ -75,17 +155,17 @@ class CarScraperSelenium:
             i = 1
             for car_make in car_makes:
                 print("\nScraping car make:", car_make)
+                self.start_make(car_make)
                 make_url = self.base_category_url + '/' + car_make
                 num_offers = self.get_number_of_offers(make_url)
 
-                if num_offers is not None and num_offers < 500:
+                if num_offers is not None and num_offers <= MAX_LISTED_OFFERS:
                     print(
-                        f"Less than 500 offers for {car_make}, doing a simple scrape.")
+                        f"At most {MAX_LISTED_OFFERS} offers for {car_make}, doing a simple scrape.")
                     self.get_car_links_paginated(make_url)
                 else:
                     print(
-                        f"-- More than 500 offers for {car_make} ({num_offers if num_offers is not None else 'unknown'}), looping through power ranges. --\n")
-                    # Loop through horsepower ranges with variable increments
+                        f"-- More than {MAX_LISTED_OFFERS} offers for {car_make} ({num_offers if num_offers is not None else 'unknown'}), splitting into power ranges. --\n")
                     self.get_car_links_power_filtered(make_url)
 
         except Exception as e:
@@ -95,29 +175,28 @@ class CarScraperSelenium:
         """Gets all car links in parallel by make, with power filter and pagination."""
         try:
             print(f"\nScraping car make: {car_make}")
+            self.start_make(car_make)
             make_url = self.base_category_url + '/' + car_make
             num_offers = self.get_number_of_offers(make_url)
 
-            if num_offers is not None and num_offers < 500:
+            if num_offers is not None and num_offers <= MAX_LISTED_OFFERS:
                 print(
-                    f"Less than 500 offers for {car_make}, doing a simple scrape.")
+                    f"At most {MAX_LISTED_OFFERS} offers for {car_make}, doing a simple scrape.")
                 self.get_car_links_paginated(make_url)
             else:
                 print(
-                    f"More than 500 offers for {car_make} ({num_offers if num_offers is not None else 'unknown'}), looping through power ranges.")
-                # Loop through horsepower ranges with variable increments
+                    f"More than {MAX_LISTED_OFFERS} offers for {car_make} ({num_offers if num_offers is not None else 'unknown'}), splitting into power ranges.")
                 self.get_car_links_power_filtered(make_url)
 
         except Exception as e:
             print(f"An error occurred: {e}")
 
         finally:
-            # Write the car links out to a file
+            # Commit the links of the last pages
             try:
-                with open(f"./car_links/{car_make}_links.txt", 'w') as f:
-                    for link in self.car_links:
-                        f.write(link + '\n')
-                print(f"\nCar links saved to {car_make}_links.txt\n")
+                self.flush_links()
+                print(
+                    f"\nCar links of {car_make} saved to {self.database_file}\n")
             except Exception as e:
                 print(
                     f"\n!!! An error occurred while saving car links: {e} !!!\n")
@@ -134,21 +213,21 @@ class CarScraperSelenium:
                     f"Car make '{make}' not found in car_makes.txt")
 
             print("\nScraping car make:", make)
+            self.start_make(make)
             make_url = self.base_category_url + '/' + make
             num_offers = self.get_number_of_offers(make_url)
 
-            if num_offers is not None and num_offers < 500:
+            if num_offers is not None and num_offers <= MAX_LISTED_OFFERS:
                 print(
-                    f"Less than 500 offers for {make}, doing a simple scrape.")
+                    f"At most {MAX_LISTED_OFFERS} offers for {make}, doing a simple scrape.")
                 self.get_car_links_paginated(make_url)
             else:
                 print(
-                    f"More than 500 offers for {make} ({num_offers if num_offers is not None else 'unknown'}), looping through power ranges.")
-                # Loop through horsepower ranges with variable increments
+                    f"More than {MAX_LISTED_OFFERS} offers for {make} ({num_offers if num_offers is not None else 'unknown'}), splitting into power ranges.")
                 if from_kw < 1:
                     from_kw = 1
-                elif from_kw > 1000:
-                    from_kw = 9999
+                elif from_kw > MAX_POWER_KW:
+                    from_kw = MAX_POWER_KW
 
                 self.get_car_links_power_filtered(make_url, from_kw)
 
@@ -158,77 +237,57 @@ class CarScraperSelenium:
     def get_car_links_power_filtered(self, make_url, min_kw=1):
         """Gets all car links of a brand with power filter, wrapping paginated scraping."""
         try:
-            # Loop through horsepower ranges with variable increments
-            kw = min_kw
-            while kw <= 1000:
-                min_kw = kw
-                # Increment kw based on ranges
-                if kw < 10:
-                    kw += 9
-                elif kw < 20:
-                    kw += 10
-                elif kw < 30:
-                    kw += 5
-                elif kw < 40:
-                    kw += 2
-                elif kw <= 250:
-                    kw += 1
-                elif kw < 350:
-                    kw += 2
-                elif kw < 400:
-                    kw += 5
-                elif kw < 500:
-                    kw += 10
-                elif kw < 600:
-                    kw += 20
-                elif kw < 750:
-                    kw += 25
-                elif kw < 1000:
-                    kw += 50
-                else:
-                    kw += 50
-                max_kw = kw
-
-                # Construct the URL with power filter parameters
-                params = {
-                    'atype': 'C',
-                    'cy': 'D,A,B,E,F,I,L,NL',
-                    'damaged_listing': 'exclude',
-                    'desc': '0',
-                    'powerfrom': min_kw,
-                    'powerto': max_kw - 1,
-                    'powertype': 'kw',
-                    'sort': 'standard',
-                    'source': 'homepage_search-mask',
-                    'ustate': 'N,U'
-                }
-
-                url_params = urlencode(params)
-                filtered_url = urljoin(make_url, '?' + url_params)
-
+            power_ranges = self.plan_power_ranges(make_url, min_kw)
+            print(
+                f"\n-- Scraping {len(power_ranges)} power ranges. --\n")
+            for low_kw, high_kw, num_offers in power_ranges:
+                filtered_url = self.build_filtered_url(
+                    make_url, low_kw, high_kw)
                 print(
-                    f"\n-- {len(self.car_links)} car links found so far. --\n")
+                    f"\n-- {self.links_found} car links found so far. --\n")
                 print(
-                    f"\nScraping with power filter: {min_kw} kw to {max_kw - 1} kw - URL: {filtered_url}\n")
+                    f"\nScraping with power filter: {low_kw} kw to {high_kw} kw ({num_offers if num_offers is not None else 'unknown'} offers) - URL: {filtered_url}\n")
                 self.get_car_links_paginated(filtered_url)
 
         except Exception as e:
             print(f"An error occurred: {e}")
 
+    def plan_power_ranges(self, make_url, min_kw=1, max_kw=MAX_POWER_KW):
+        """Splits the power range of a brand into ranges that can be paginated completely (see `plan_power_ranges`)."""
+        return plan_power_ranges(make_url, self.get_number_of_offers, min_kw, max_kw)
+
+    def build_filtered_url(self, make_url, min_kw=None, max_kw=None):
+        """Builds the category URL of a brand, optionally filtered to a power range in kw (inclusive)."""
+        return build_filtered_url(make_url, min_kw, max_kw)
+
     def get_car_links_paginated(self, filtered_url):
         """Scrapes car links from a single filtered page, including pagination."""
+        if self.http_first and not self.capture_search:
+            pages = crawl_category_pages(filtered_url)
+            if pages is not None:
+                for page, page_links in enumerate(pages, start=1):
+                    if page_links is None:
+                        # Only this page failed over HTTP, load it in the browser
+                        page_links = self.get_single_page_links(
+                            build_page_url(filtered_url, page))
+                    if page_links is not None:
+                        self.save_page_links(page_links)
+                return
+            print("Could not crawl the pages over HTTP, falling back to the browser.")
         try:
             self.driver.get(filtered_url)  # Get the page
+            self.pages_loaded += 1
             i = 1  # Initialize page counter
             last_scraped_page = 0  # Initialize last scraped page
-            time.sleep(5)  # Wait for the page to load
+            wait_for_results(self.driver)  # Wait for the results instead of a fixed sleep
+            reloaded = True  # Page rendered by the server, its listings are embedded
 
             if not self.has_handled_consent:
                 self.handle_consent_popup()
 
             while True:  # Loop through pagination
-                html = self.driver.page_source
-                soup = parse_html(html)
+                # Hrefs and pagination state are read in the browser, no page source transfer
+                results = read_results_page(self.driver)
 
                 if (i > 20):
                     print(
@@ -236,8 +295,19 @@ class CarScraperSelenium:
 
                 if i > last_scraped_page:
                     print(f"Scraping page {i}...")
-                    self.car_links.extend(
-                        extract_car_links(soup, self.base_url))
+                    self.save_page_links(
+                        car_links_from_hrefs(results["hrefs"], self.base_url))
+                    if self.capture_search:
+                        self.capture_listings(reloaded)
+                    reloaded = False
+
+                if not results["has_next"] and not results["has_pagination"] and len(results["hrefs"]) >= RESULTS_PER_PAGE:
+                    # A full page without pagination yet: it may still be rendering
+                    results = wait_for_pagination(self.driver)
+
+                if not results["has_next"]:
+                    print("\nNext button is disabled or missing. End of pagination.\n")
+                    break
 
                 # Find the "Next" button
                 try:
@@ -266,12 +336,14 @@ class CarScraperSelenium:
                         # print(f"Moved to page {i + 1}")
                         last_scraped_page = i  # Update last scraped page
                         i += 1  # Increment page counter
+                        self.pages_loaded += 1
 
                     except:
                         print(
                             "\n!!! Timeout waiting for page to load. Retrying... !!!\n")
                         self.driver.refresh()  # Refresh the page
-                        time.sleep(5)  # Give the page some time to load
+                        wait_for_results(self.driver)  # Give the page some time to load
+                        reloaded = True
                         continue  # Continue to the next iteration of the loop
 
                 except:
@@ -281,29 +353,62 @@ class CarScraperSelenium:
         except Exception as e:
             print(f"An error occurred while scraping a filtered page: {e}")
 
+    def get_single_page_links(self, page_url):
+        """Loads a single result page in the browser and returns its car links, or None on errors."""
+        try:
+            print(f"Loading {page_url} in the browser...")
+            self.driver.get(page_url)
+            self.pages_loaded += 1
+            wait_for_results(self.driver)
+            if not self.has_handled_consent:
+                self.handle_consent_popup()
+            results = read_results_page(self.driver)
+            return car_links_from_hrefs(results["hrefs"], self.base_url)
+        except Exception as e:
+            print(f"An error occurred while scraping a result page: {e}")
+            return None
+
+    def capture_listings(self, reloaded):
+        """
+        Passes the listing summaries of the open results page to `on_listing`: from
+        the captured search responses after client-side pagination, or from the
+        embedded page JSON after a full page load.
+        """
+        try:
+            responses = capture_search_responses(self.driver)
+            if reloaded:
+                embedded = read_embedded_search_data(self.driver)
+                responses = [embedded] if embedded else responses
+            for data in responses:
+                for record in scrape_search_listings(data, self.base_url):
+                    record["make"] = self.current_make
+                    self.listings_captured += 1
+                    if self.on_listing:
+                        self.on_listing(record)
+        except Exception as e:
+            print(f"An error occurred while capturing the search listings: {e}")
+
     # ----- SCRAPING UTILITY FUNCTIONS ----
     def get_number_of_offers(self, url):
         """Gets the number of offers from the category page."""
+        if self.http_first:
+            number = fetch_number_of_offers(url)
+            if number is not None:
+                return number
         try:
             self.driver.get(url)
-            time.sleep(5)  # Wait for the page to load
+            self.pages_loaded += 1
+            wait_for_results(self.driver)  # Wait for the results instead of a fixed sleep
 
             # Handle the consent popup
             if not self.has_handled_consent:
                 self.handle_consent_popup()
 
-            html = self.driver.page_source
-            soup = parse_html(html)
-
-            h1_tag = soup.find('h1', {'data-testid': 'list-header-title'})
-            if h1_tag:
-                text = h1_tag.text
-                # Extract the number from the text
-                number = int(text.split(' ')[0].replace(',', ''))
-                return number
-            else:
+            header = read_results_page(self.driver)["header"]
+            if header is None:
                 print("H1 tag not found.")
                 return None
+            return parse_number_of_offers(header)
         except Exception as e:
             print(f"An error occurred while getting the number of offers: {e}")
             return None
@@ -311,13 +416,8 @@ class CarScraperSelenium:
     def get_current_page_number(self):
         """Gets the current page number from the aria-current attribute."""
         try:
-            # print("Getting current page number...")
-            current_page_button = WebDriverWait(self.driver, 5).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, '//button[@aria-current="page"]'))
-            )
-            # print("Current page number found:", current_page_button.text)
-            return int(current_page_button.text)
+            current_page = read_results_page(self.driver)["current_page"]
+            return current_page if current_page is not None else -1
         except:
             print("Could not find current page number, returning -1")
             return -1
@@ -344,6 +444,9 @@ class CarScraperSelenium:
             print(f"An error occurred: {e}")
 
     def close(self):
-        """Closes the database connection and the Selenium WebDriver."""
-        self.conn.close()
-        self.driver.quit()
+        """Commits the remaining links, closes the database connection and the Selenium WebDriver (if owned)."""
+        try:
+            self.flush_links()
+        finally:
+            self.link_store.close()
+            self.release_driver()
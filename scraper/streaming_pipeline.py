@@ -0,0 +1,138 @@
+from crawl_scheduler import crawl_car_links
+from requests_scraper import scrape_car_details_from_url, UNCHANGED
+from utils.listing_state import get_listing_state
+from utils.progress_journal import ProgressJournal
+from utils.parquet_writer import CarDetailsWriter
+import threading
+import queue
+import os
+
+
+# Stop signal of the detail workers, queued once per worker after the crawl
+STOP = None
+
+
+class DedupLinkQueue:
+    """
+    Bounded queue of (url, make) between the link crawler and the detail workers.
+    A URL is not queued again while it is in flight (queued, being scraped or
+    buffered by the writer) or once `is_completed` reports it as written, so only
+    the in-flight URLs are held in memory. `put` blocks while the queue is full,
+    so the crawl slows down to the pace of the detail workers instead of piling
+    up links.
+    """
+
+    def __init__(self, maxsize=1000, is_completed=None):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.is_completed = is_completed  # Optional: checks whether a URL was written before
+        self.in_flight = set()
+        self.lock = threading.Lock()
+        self.queued = 0
+
+    def put_links(self, make, links):
+        """Queues the links neither in flight nor completed, blocking while the queue is full."""
+        for link in links:
+            with self.lock:
+                if link in self.in_flight:
+                    continue
+            if self.is_completed and self.is_completed(link):
+                continue
+            with self.lock:
+                if link in self.in_flight:
+                    continue
+                self.in_flight.add(link)
+                self.queued += 1
+            self.queue.put((link, make))
+
+    def finish(self, links):
+        """Drops links from the in-flight set, once written (or failed)."""
+        with self.lock:
+            self.in_flight.difference_update(links)
+
+    def get(self):
+        return self.queue.get()
+
+    def task_done(self):
+        self.queue.task_done()
+
+    def close(self, workers):
+        """Queues one stop signal per detail worker, after all queued links."""
+        for _ in range(workers):
+            self.queue.put(STOP)
+
+
+def stream_car_details(car_makes, crawl_workers=None, detail_workers=None, output_dir="all_car_details", queue_size=1000, journal_file="stream_progress.db"):
+    """
+    Crawls the car links and scrapes their details in one pipeline: crawl workers
+    push new links into a bounded queue as soon as a result page is scraped, and
+    detail workers fetch them right away, streaming the records into the
+    partitioned `output_dir` dataset. The links are also kept in the link store.
+    Written URLs are journaled, so a rerun after a crash skips them.
+    """
+    detail_workers = detail_workers or os.cpu_count() * 4
+    journal = ProgressJournal(journal_file)
+    links = DedupLinkQueue(queue_size, is_completed=journal.is_completed)
+    state = get_listing_state()
+
+    def on_flush(records):
+        # Only once the records are on disk, so a failed write is retried on the next run
+        if state:
+            state.record_saved(records)
+        journal.add_batch(records)
+        links.finish(record["url"] for record in records)
+
+    writer = CarDetailsWriter(output_dir, batch_size=500, on_flush=on_flush,
+                              filter_records=state.filter_changed if state else None)
+    writer_lock = threading.Lock()  # The writer is shared by all detail workers
+    scraped = [0]
+
+    def detail_worker():
+        while True:
+            item = links.get()
+            try:
+                if item is STOP:
+                    break
+                url, make = item
+                details = None
+                try:
+                    details = scrape_car_details_from_url(
+                        url, make, unchanged=UNCHANGED)
+                    if details is UNCHANGED:
+                        # Not modified since the last run, so done without a write
+                        journal.add_batch([{"url": url, "make": make}])
+                        details = None
+                finally:
+                    if not details:
+                        # Unchanged, or failed and a later page listing it queues it again
+                        links.finish([url])
+                if details:
+                    with writer_lock:
+                        writer.add(details)
+                        scraped[0] += 1
+                        print(
+                            f"-> {scraped[0]} scraped / {links.queued} links queued", end="\r")
+            except Exception as e:
+                print(f"An error occurred in a detail worker: {e}")
+            finally:
+                links.task_done()
+
+    threads = [threading.Thread(target=detail_worker, daemon=True)
+               for _ in range(detail_workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        try:
+            crawl_car_links(car_makes, crawl_workers, on_links=links.put_links)
+        finally:
+            # Let the detail workers finish the queued links, then stop them
+            links.close(detail_workers)
+            for thread in threads:
+                thread.join()
+            with writer_lock:
+                writer.close()
+        journal.reset()  # The run is complete, the next one starts over
+    finally:
+        journal.close()
+    print("\n--- Streaming pipeline completed. ---")
+    print(f"- Links queued: {links.queued}")
+    print(f"- Total car details written: {writer.rows_written}")
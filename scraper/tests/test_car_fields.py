@@ -0,0 +1,16 @@
+from utils.car_fields import CAR_DETAILS_FIELDS
+from utils.car_schema import CAR_DETAILS_SCHEMA
+import subprocess
+import sys
+import os
+
+
+def test_fields_match_the_schema():
+    assert CAR_DETAILS_FIELDS == CAR_DETAILS_SCHEMA.names
+
+
+def test_category_page_scraper_does_not_import_pyarrow():
+    code = "import sys, utils.category_page_scraper; print('pyarrow' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == "False"
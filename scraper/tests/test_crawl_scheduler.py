@@ -0,0 +1,105 @@
+import crawl_scheduler
+import threading
+import time
+import re
+
+
+class FakePooledDriver:
+    driver = None
+    has_handled_consent = False
+    pages = 0
+
+
+class FakeDriverPool:
+    acquired = 0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def acquire(self):
+        FakeDriverPool.acquired += 1
+        return FakePooledDriver()
+
+    def release(self, pooled):
+        pass
+
+    def close(self):
+        pass
+
+
+def count_offers(url):
+    """4 offers per kw between 50 and 349 kw, 900 offers for the whole make."""
+    match = re.search(r"powerfrom=(\d+)&powerto=(\d+)", url)
+    if not match:
+        return 1200 if "/big" in url else 150
+    low_kw, high_kw = int(match.group(1)), int(match.group(2))
+    return 4 * max(0, min(high_kw, 349) - max(low_kw, 50) + 1)
+
+
+class FakeScraper:
+    base_category_url = "https://www.autoscout24.com/lst"
+    planned_by = set()
+    counted = []
+    scraped = []
+
+    def __init__(self, *args, driver_source=None, **kwargs):
+        self.pages_loaded = 0
+        self.has_handled_consent = False
+        self.driver_source = driver_source
+
+    def use_driver_source(self, driver_source):
+        self.driver_source = driver_source
+
+    def get_number_of_offers(self, url):
+        FakeScraper.planned_by.add(threading.current_thread().name)
+        FakeScraper.counted.append(url)
+        time.sleep(0.02)  # A count request takes a while
+        return count_offers(url)
+
+    def build_filtered_url(self, make_url, min_kw=None, max_kw=None):
+        return f"{make_url}?powerfrom={min_kw}&powerto={max_kw}"
+
+    def start_make(self, car_make):
+        self.car_make = car_make
+
+    def get_car_links_paginated(self, url):
+        if self.car_make == "browser-only":
+            self.driver_source()  # The HTTP crawl failed, a browser is needed
+        FakeScraper.scraped.append((self.car_make, url, count_offers(url)))
+
+    def flush_links(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_bisection_steps_are_separate_tasks(monkeypatch):
+    monkeypatch.setattr(crawl_scheduler, "DriverPool", FakeDriverPool)
+    monkeypatch.setattr(crawl_scheduler, "CarScraperSelenium", FakeScraper)
+    FakeScraper.planned_by = set()
+    FakeScraper.counted = []
+    FakeScraper.scraped = []
+    FakeDriverPool.acquired = 0
+    crawl_scheduler.crawl_car_links(["big", "small"], workers=4)
+
+    scraped = FakeScraper.scraped
+    assert ("small", "https://www.autoscout24.com/lst/small", 150) in scraped
+    big_ranges = [offers for make, _, offers in scraped if make == "big"]
+    assert all(offers <= crawl_scheduler.MAX_LISTED_OFFERS for offers in big_ranges)
+    assert sum(big_ranges) == 1200  # Every offer of 50-349 kw is in exactly one range
+    full_range = f"powerfrom=1&powerto={crawl_scheduler.MAX_POWER_KW}"
+    assert not any(full_range in url for url in FakeScraper.counted)  # The make count covers it
+    assert len(FakeScraper.planned_by) > 1  # The count requests ran on several workers
+    assert FakeDriverPool.acquired == 0  # Everything was fetched over HTTP, no browser leased
+
+
+def test_browser_is_leased_only_when_needed(monkeypatch):
+    monkeypatch.setattr(crawl_scheduler, "DriverPool", FakeDriverPool)
+    monkeypatch.setattr(crawl_scheduler, "CarScraperSelenium", FakeScraper)
+    FakeScraper.scraped = []
+    FakeDriverPool.acquired = 0
+    crawl_scheduler.crawl_car_links(["small", "browser-only"], workers=2)
+
+    assert len(FakeScraper.scraped) == 2
+    assert FakeDriverPool.acquired == 1
@@ -0,0 +1,34 @@
+from utils.driver_pool import DriverPool, LazyLease
+
+
+class FakeDriver:
+    def execute_script(self, script):
+        return 1 if script == "return 1" else None
+
+    def quit(self):
+        pass
+
+
+def test_browsers_start_on_demand():
+    started = []
+
+    def create_driver():
+        started.append(FakeDriver())
+        return started[-1]
+
+    pool = DriverPool(2, create_driver=create_driver)
+    assert not started
+
+    lease = LazyLease(pool)
+    lease.release()  # Never needed a browser
+    assert not started
+
+    first = lease.acquire()
+    assert lease.acquire() is first
+    assert len(started) == 1
+    lease.release()
+
+    # A released browser is reused before a new one is started
+    assert LazyLease(pool).acquire() is first
+    assert len(started) == 1
+    pool.close()
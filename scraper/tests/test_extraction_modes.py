@@ -0,0 +1,23 @@
+from conftest import read_fixture
+from utils.car_details_scraper import scrape_car_details_from_html, default_extraction_mode
+from utils.listing_json_scraper import extract_listing_json
+
+
+def test_dom_is_the_default_mode(monkeypatch):
+    monkeypatch.delenv("SCRAPER_EXTRACTION", raising=False)
+    assert default_extraction_mode() == "dom"
+
+
+def test_json_mode_matches_dom_mode():
+    html = read_fixture("detail_dealer.html")
+    assert extract_listing_json(html) is not None
+    from_dom = scrape_car_details_from_html(html, "dom")
+    from_json = scrape_car_details_from_html(html, "json")
+    assert from_dom["car_title"] == "BMW 320d Touring"
+    assert from_json == from_dom
+
+
+def test_json_mode_falls_back_to_dom_without_page_json():
+    html = read_fixture("detail_private_seller.html")
+    assert extract_listing_json(html) is None
+    assert scrape_car_details_from_html(html, "json") == scrape_car_details_from_html(html, "dom")
@@ -0,0 +1,52 @@
+from utils.html_archive import HtmlArchive
+import multiprocessing
+
+
+def store_pages(directory, worker, count):
+    archive = HtmlArchive(directory, segment_size=4096, commit_every=7)
+    for i in range(count):
+        archive.store(f"https://example.com/offers/{worker}-{i}",
+                      f"<html>{worker} {i} {'x' * (i % 50)}</html>".encode(), "bmw")
+    archive.store("https://example.com/offers/shared", b"<html>shared</html>", "bmw")
+    archive.close()
+
+
+def test_concurrent_processes_store_readable_pages(tmp_path):
+    directory = str(tmp_path / "archive")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=store_pages, args=(directory, worker, 60))
+                 for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    archive = HtmlArchive(directory)
+    try:
+        rows = archive.conn.execute("SELECT url, digest FROM pages").fetchall()
+        assert len(rows) == 4 * 61
+        for url, digest in rows:
+            worker_page = url.rsplit('/', 1)[1]
+            if worker_page == "shared":
+                assert archive.load(digest) == b"<html>shared</html>"
+            else:
+                worker, i = (int(part) for part in worker_page.split('-'))
+                assert archive.load(digest) == \
+                    f"<html>{worker} {i} {'x' * (i % 50)}</html>".encode()
+        segments = archive.conn.execute("SELECT DISTINCT segment FROM blobs").fetchall()
+        assert len({segment.split('-')[1] for segment, in segments}) == 4
+    finally:
+        archive.close()
+
+
+def test_index_rows_are_committed_in_batches(tmp_path):
+    archive = HtmlArchive(str(tmp_path), commit_every=10)
+    for i in range(9):
+        archive.store(f"https://example.com/offers/{i}", f"page {i}".encode())
+    other = HtmlArchive(str(tmp_path))
+    assert other.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0] == 0
+    archive.store("https://example.com/offers/9", b"page 9")
+    assert other.conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0] == 10
+    other.close()
+    archive.close()
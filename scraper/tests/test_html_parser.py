@@ -0,0 +1,33 @@
+from conftest import read_fixture
+from utils.car_details_scraper import scrape_car_details_from_soup
+from utils.category_page_scraper import extract_car_links, extract_car_cards, extract_number_of_offers
+from utils.html_parser import parse_html, HtmlNode, PARSER_BACKENDS
+import pytest
+
+
+DETAIL_PAGES = ["detail_dealer.html", "detail_private_seller.html"]
+
+
+def test_html_node_is_abstract():
+    with pytest.raises(TypeError):
+        HtmlNode()
+
+
+@pytest.mark.parametrize("backend", PARSER_BACKENDS)
+@pytest.mark.parametrize("page", DETAIL_PAGES)
+def test_detail_fields_match_html_parser(backend, page):
+    html = read_fixture(page)
+    reference = scrape_car_details_from_soup(parse_html(html, "html.parser"))
+    assert reference["price"] == 23490
+    assert scrape_car_details_from_soup(parse_html(html, backend)) == reference
+
+
+@pytest.mark.parametrize("backend", PARSER_BACKENDS)
+def test_category_page_matches_html_parser(backend):
+    html = read_fixture("category_page.html")
+    base_url = "https://www.autoscout24.com"
+    reference = parse_html(html, "html.parser")
+    soup = parse_html(html, backend)
+    assert extract_number_of_offers(soup) == 1234
+    assert extract_car_links(soup, base_url) == extract_car_links(reference, base_url)
+    assert extract_car_cards(soup, base_url) == extract_car_cards(reference, base_url)
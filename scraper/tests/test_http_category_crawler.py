@@ -0,0 +1,31 @@
+from conftest import read_fixture
+from utils.html_parser import parse_html
+import http_category_crawler
+
+
+def test_failed_page_is_none_and_retried(monkeypatch):
+    """1,234 offers are 20 pages: page 3 fails once and is retried, page 5 keeps failing."""
+    attempts = {}
+
+    def fetch_category_page(url):
+        page = int(url.split("page=")[1].split("&")[0]) if "page=" in url else 1
+        attempts[page] = attempts.get(page, 0) + 1
+        if page == 5 or (page == 3 and attempts[page] == 1):
+            return None
+        return parse_html(read_fixture("category_page.html"))
+
+    monkeypatch.setattr(http_category_crawler, "fetch_category_page", fetch_category_page)
+    pages = http_category_crawler.crawl_category_pages(
+        "https://www.autoscout24.com/lst/bmw", workers=4)
+
+    assert len(pages) == 20
+    assert pages[4] is None
+    assert all(links for page, links in enumerate(pages, start=1) if page != 5)
+    assert attempts[3] == 2
+    assert attempts[5] == 2
+
+
+def test_category_without_first_page_falls_back(monkeypatch):
+    monkeypatch.setattr(http_category_crawler, "fetch_category_page", lambda url: None)
+    assert http_category_crawler.crawl_category_pages(
+        "https://www.autoscout24.com/lst/bmw") is None
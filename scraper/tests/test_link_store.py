@@ -0,0 +1,40 @@
+from utils.link_store import LinkStore, StoredLinks
+import requests_scraper
+
+
+def make_store(path, links):
+    store = LinkStore(path)
+    store.add_links("audi", links)
+    store.add_links("bmw", ["https://www.autoscout24.com/offers/bmw-0"])
+    return store
+
+
+def test_stored_links_are_counted_and_streamed(tmp_path):
+    path = str(tmp_path / "links.db")
+    links = [f"https://www.autoscout24.com/offers/audi-{i}" for i in range(2500)]
+    make_store(path, links).close()
+    stored = StoredLinks("audi", path)
+    assert len(stored) == 2500
+    streamed = iter(stored)
+    assert next(streamed) == links[0]
+    assert list(streamed) == links[1:]
+
+
+def test_stored_links_stream_only_the_counted_links(tmp_path):
+    path = str(tmp_path / "links.db")
+    store = make_store(path, ["https://www.autoscout24.com/offers/audi-0"])
+    stored = StoredLinks("audi", path)
+    store.add_links("audi", ["https://www.autoscout24.com/offers/audi-1"])
+    store.close()
+    assert list(stored) == ["https://www.autoscout24.com/offers/audi-0"]
+
+
+def test_threaded_mode_scrapes_stored_links(tmp_path, monkeypatch):
+    path = str(tmp_path / "links.db")
+    links = [f"https://www.autoscout24.com/offers/audi-{i}" for i in range(300)]
+    make_store(path, links).close()
+    monkeypatch.setattr(requests_scraper, "scrape_car_details_from_url",
+                        lambda url, make: {"url": url, "make": make})
+    records = requests_scraper.parallel_scrape_car_details_by_make(
+        "audi", StoredLinks("audi", path))
+    assert sorted(record["url"] for record in records) == sorted(links)
@@ -0,0 +1,70 @@
+from utils.listing_state import ListingState
+from utils.parquet_writer import CarDetailsWriter
+import pytest
+
+
+def make_record(i, price):
+    return {"url": f"https://example.com/offers/{i}", "make": "bmw", "price": price}
+
+
+def make_writer(tmp_path, state):
+    return CarDetailsWriter(str(tmp_path / "out"), batch_size=10, on_flush=state.record_saved,
+                            filter_records=state.filter_changed)
+
+
+def test_hashes_are_stored_only_after_the_write(tmp_path, monkeypatch):
+    state = ListingState(str(tmp_path / "state.db"))
+    writer = make_writer(tmp_path, state)
+
+    def failing_write(make, records):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer, "write_part", failing_write)
+    for i in range(3):
+        writer.add(make_record(i, 1000))
+    with pytest.raises(OSError):
+        writer.flush()
+    # Nothing was written, so every record still counts as changed
+    assert len(state.filter_changed([make_record(i, 1000) for i in range(3)])) == 3
+
+    writer = make_writer(tmp_path, state)
+    for i in range(3):
+        writer.add(make_record(i, 1000))
+    writer.close()
+    assert writer.rows_written == 3
+
+    writer = make_writer(tmp_path, state)
+    writer.add(make_record(0, 1000))
+    writer.add(make_record(1, 900))
+    writer.close()
+    assert writer.rows_written == 1  # Only the listing whose price changed
+    state.close()
+
+
+def test_validators_are_stored_only_with_the_record(tmp_path, monkeypatch):
+    state = ListingState(str(tmp_path / "state.db"))
+    url = make_record(0, 1000)["url"]
+    state.record_fetch(url, "bmw", etag='"v1"')
+    writer = make_writer(tmp_path, state)
+    writer.add(make_record(0, 1000))
+    writer.close()
+    assert state.conditional_headers(url) == {"If-None-Match": '"v1"'}
+
+    # The page changed, but writing its record fails: the old validator stays
+    state.record_fetch(url, "bmw", etag='"v2"')
+    writer = make_writer(tmp_path, state)
+
+    def failing_write(make, records):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer, "write_part", failing_write)
+    writer.add(make_record(0, 900))
+    with pytest.raises(OSError):
+        writer.flush()
+    assert state.conditional_headers(url) == {"If-None-Match": '"v1"'}
+
+    writer = make_writer(tmp_path, state)
+    writer.add(make_record(0, 900))
+    writer.close()
+    assert state.conditional_headers(url) == {"If-None-Match": '"v2"'}
+    state.close()
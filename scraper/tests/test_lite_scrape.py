@@ -0,0 +1,27 @@
+from conftest import read_fixture
+from utils.html_parser import parse_html
+import pyarrow.parquet as pq
+import http_category_crawler
+
+
+def test_failed_pages_are_retried_and_failed_makes_reported(monkeypatch, tmp_path):
+    attempts = {}
+
+    def fetch_category_page(url):
+        attempts[url] = attempts.get(url, 0) + 1
+        # Page 2 of bmw fails in the crawl (and its retry) and works on the final retry
+        if "/bmw" in url and url.endswith("page=2") and attempts[url] <= 2:
+            return None
+        return parse_html(read_fixture("category_page.html"))
+
+    def fetch_number_of_offers(url):
+        return None if "/audi" in url else 300
+
+    monkeypatch.setattr(http_category_crawler, "fetch_category_page", fetch_category_page)
+    monkeypatch.setattr(http_category_crawler, "fetch_number_of_offers", fetch_number_of_offers)
+    failures = http_category_crawler.scrape_lite_car_details(
+        ["bmw", "audi"], output_dir=str(tmp_path / "lite"))
+
+    assert failures == [("audi", "https://www.autoscout24.com/lst/audi", None)]
+    # The fixture header has 1,234 offers: 20 pages of 3 linked cards, none missing after the retry
+    assert pq.read_table(str(tmp_path / "lite")).num_rows == 60
@@ -0,0 +1,43 @@
+from conftest import read_fixture
+from datetime import date
+from utils.car_details_scraper import scrape_car_record_from_html
+from utils.car_schema import CAR_DETAILS_SCHEMA
+from utils.normalize import parse_int, parse_price, parse_power_hp, parse_fuel_consumption, parse_year_month
+from utils.parquet_writer import with_raw_equipment
+import pyarrow as pa
+import pytest
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("112,000 km", 112000), ("1,995 cc", 1995), ("5", 5), (7, 7), ("-", None), (None, None),
+    ("1.5", 1), ("1,234.5 kg", 1234)])
+def test_parse_int(text, expected):
+    assert parse_int(text) == expected
+
+
+def test_parse_price_power_and_consumption():
+    assert parse_price("€ 23,490.-") == 23490
+    assert parse_power_hp("140 kW (190 hp)") == 190
+    assert parse_fuel_consumption("6.1 l/100 km (city) 4.8 l/100 km (comb.)") == 4.8
+    assert parse_fuel_consumption("5,6 l/100 km") == 5.6
+    assert parse_fuel_consumption("16.5 kWh/100 km (comb.)") == 16.5
+    assert parse_fuel_consumption("4.2 kg/100 km (comb.)") == 4.2
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("05/2019", date(2019, 5, 1)), ("05-2019", date(2019, 5, 1)),
+    ("2019-05", date(2019, 5, 1)), ("2019-05-01", date(2019, 5, 1)),
+    ("13/2019", None), ("new", None)])
+def test_parse_year_month(text, expected):
+    assert parse_year_month(text) == expected
+
+
+@pytest.mark.parametrize("fixture", ["detail_dealer.html", "detail_private_seller.html"])
+def test_records_match_the_schema_types(fixture):
+    record = scrape_car_record_from_html(
+        read_fixture(fixture), "https://www.autoscout24.com/offers/test", "bmw")
+    # Typed at extraction time: converts to the Parquet schema without casting text
+    table = pa.Table.from_pylist([with_raw_equipment(record)], schema=CAR_DETAILS_SCHEMA)
+    assert table.num_rows == 1
+    assert isinstance(record["price"], int)
+    assert isinstance(record["first_registration"], date)
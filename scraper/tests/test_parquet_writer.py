@@ -0,0 +1,15 @@
+from utils.parquet_writer import CarDetailsWriter
+import pyarrow.dataset as ds
+
+
+def test_equipment_is_written_as_lists_and_raw_text(tmp_path):
+    writer = CarDetailsWriter(str(tmp_path), batch_size=10)
+    writer.add({"url": "https://example.com/offers/1", "make": "bmw",
+                "extras": ["Alloy wheels", "Sport seats"], "safety_and_security": []})
+    writer.add({"url": "https://example.com/offers/2", "make": "bmw"})
+    writer.close()
+
+    table = ds.dataset(str(tmp_path), partitioning="hive").to_table().sort_by("url")
+    assert table["extras"].to_pylist() == [["Alloy wheels", "Sport seats"], None]
+    assert table["extras_raw"].to_pylist() == ["Alloy wheels;Sport seats", None]
+    assert table["safety_and_security_raw"].to_pylist() == ["", None]
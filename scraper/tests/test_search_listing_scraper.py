@@ -0,0 +1,34 @@
+from conftest import read_fixture
+from utils.search_listing_scraper import scrape_search_listings
+from utils.car_fields import CAR_DETAILS_FIELDS
+from crawl_scheduler import listing_writer
+import pyarrow.parquet as pq
+import json
+
+
+def test_search_listings_map_to_partial_records():
+    data = json.loads(read_fixture("search_response.json"))
+    records = scrape_search_listings(data, "https://www.autoscout24.com")
+
+    assert len(records) == 1  # The listing without a URL is skipped
+    record = records[0]
+    assert record["url"].startswith("https://www.autoscout24.com/offers/bmw-320")
+    assert record["car_title"] == "BMW 320"
+    assert record["location"] == "80331 Munich, DE"
+    assert record["price"] == 18990
+    assert record["mileage"] == 85000
+    assert record["fuel_type"] == "Diesel"
+    assert record["power"] == 190
+    assert set(record) <= set(CAR_DETAILS_FIELDS)  # Nothing is dropped by the schema
+
+
+def test_captured_listings_are_written(tmp_path):
+    data = json.loads(read_fixture("search_response.json"))
+    with listing_writer(str(tmp_path / "lite")) as on_listing:
+        for record in scrape_search_listings(data, "https://www.autoscout24.com"):
+            record["make"] = "bmw"
+            on_listing(record)
+
+    table = pq.read_table(str(tmp_path / "lite"))
+    assert table.num_rows == 1
+    assert table.column("car_title").to_pylist() == ["BMW 320"]
@@ -0,0 +1,52 @@
+from selenium_scraper import CarScraperSelenium
+from utils.selenium_scraper_setup import RESULTS_PAGE_SCRIPT
+
+
+class FakeNextButton:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def get_attribute(self, name):
+        return "false"
+
+    def click(self):
+        self.driver.page += 1
+        self.driver.reads = 0
+
+
+class FakeDriver:
+    """Two full result pages whose pagination is only rendered from the second read on."""
+
+    def __init__(self):
+        self.page = 1
+        self.reads = 0
+
+    def get(self, url):
+        pass
+
+    def find_element(self, by, value):
+        return FakeNextButton(self)
+
+    def execute_script(self, script, *args):
+        assert script == RESULTS_PAGE_SCRIPT
+        self.reads += 1
+        rendered = self.reads > 1
+        return {
+            "hrefs": [f"/offers/car-{self.page}-{i}" for i in range(20)],
+            "header": "40 Offers for BMW",
+            "current_page": self.page if rendered else None,
+            "has_next": rendered and self.page == 1,
+            "has_pagination": rendered,
+        }
+
+    def quit(self):
+        pass
+
+
+def test_waits_for_pagination_before_ending(tmp_path):
+    scraper = CarScraperSelenium(str(tmp_path / "links.db"), http_first=False, capture_search=False)
+    scraper.use_driver(FakeDriver(), has_handled_consent=True)
+    scraper.start_make("bmw")
+    scraper.get_car_links_paginated("https://www.autoscout24.com/lst/bmw")
+    assert scraper.links_found == 40
+    scraper.close()
@@ -0,0 +1,66 @@
+from cli import run_cli
+from utils.link_store import LinkStore
+from utils.sharding import Shard, parse_shard, shard_output_dir, merge_shard_outputs
+import multiprocessing
+import pyarrow.dataset as ds
+import pytest
+import requests_scraper
+import os
+
+SHARDS = 3
+
+
+def fake_scrape_by_make(make, links, on_result):
+    for link in links:
+        on_result({"url": link, "make": make, "car_title": make.upper()})
+
+
+def run_shard(index, link_store_file, output_dir, work_dir):
+    """Runs the details command of one shard in its own process."""
+    os.chdir(work_dir)
+    requests_scraper.DETAIL_SCRAPING_MODES["fake"] = fake_scrape_by_make
+    shard = Shard(index, SHARDS)
+    requests_scraper.scrape_all_car_details(
+        mode="fake", journal_file=f"progress-{index}.db", output_dir=shard_output_dir(output_dir, shard),
+        shard=shard, link_store_file=link_store_file)
+
+
+def test_shards_split_the_links_and_merge(tmp_path):
+    links = {make: [f"https://www.autoscout24.com/offers/{make}-{i}" for i in range(60)]
+             for make in ["audi", "bmw", "fiat"]}
+    link_store_file = str(tmp_path / "merged.db")
+    store = LinkStore(link_store_file)
+    for make, make_links in links.items():
+        store.add_links(make, make_links)
+    store.close()
+    output_dir = str(tmp_path / "all_car_details")
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=run_shard, args=(index, link_store_file, output_dir, str(tmp_path)))
+                 for index in range(SHARDS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    # Every shard wrote exactly the URLs it owns
+    for index in range(SHARDS):
+        shard = parse_shard(f"{index}/{SHARDS}")
+        urls = ds.dataset(shard_output_dir(output_dir, shard), partitioning="hive").to_table().column("url").to_pylist()
+        assert urls and all(shard.owns(url) for url in urls)
+
+    shard_dirs = [shard_output_dir(output_dir, Shard(index, SHARDS)) for index in range(SHARDS)]
+    assert merge_shard_outputs(shard_dirs, output_dir) > 0
+    assert merge_shard_outputs(shard_dirs, output_dir) == 0  # Merging again adds nothing
+    merged = ds.dataset(output_dir, partitioning="hive", exclude_invalid_files=True).to_table()
+    urls = merged.column("url").to_pylist()
+    assert sorted(urls) == sorted(url for make_links in links.values() for url in make_links)
+    assert os.path.exists(os.path.join(output_dir, "_metadata"))
+
+
+def test_link_shards_need_a_plan(tmp_path):
+    makes_file = tmp_path / "makes.txt"
+    makes_file.write_text("audi\nbmw\n")
+    with pytest.raises(SystemExit):
+        run_cli(["links", "--shard", "0/2", "--makes", str(makes_file)])
@@ -0,0 +1,55 @@
+from utils.progress_journal import ProgressJournal
+from streaming_pipeline import DedupLinkQueue
+import pyarrow.parquet as pq
+import streaming_pipeline
+
+
+def test_links_are_deduplicated_while_in_flight_and_after_written(tmp_path):
+    journal = ProgressJournal(str(tmp_path / "progress.db"))
+    journal.add_batch([{"url": "https://a/offers/written", "make": "bmw"}])
+    links = DedupLinkQueue(10, is_completed=journal.is_completed)
+
+    links.put_links("bmw", ["https://a/offers/1", "https://a/offers/1", "https://a/offers/written"])
+    assert links.queued == 1  # Duplicate and journaled URL skipped
+
+    links.put_links("bmw", ["https://a/offers/1"])
+    assert links.queued == 1  # Still in flight
+
+    # Once written, the URL leaves memory and the journal skips it
+    journal.add_batch([{"url": "https://a/offers/1", "make": "bmw"}])
+    links.finish(["https://a/offers/1"])
+    assert not links.in_flight
+    links.put_links("bmw", ["https://a/offers/1"])
+    assert links.queued == 1
+
+    # A failed URL can be queued again
+    links.put_links("bmw", ["https://a/offers/2"])
+    links.finish(["https://a/offers/2"])
+    links.put_links("bmw", ["https://a/offers/2"])
+    assert links.queued == 3
+    journal.close()
+
+
+def test_unchanged_pages_are_journaled_without_a_write(tmp_path, monkeypatch):
+    pages = {"https://a/offers/new": {"url": "https://a/offers/new", "make": "bmw", "car_title": "BMW"},
+             "https://a/offers/unchanged": streaming_pipeline.UNCHANGED,
+             "https://a/offers/failed": None}
+
+    def fake_crawl(car_makes, crawl_workers, on_links):
+        on_links("bmw", list(pages))
+
+    monkeypatch.setattr(streaming_pipeline, "crawl_car_links", fake_crawl)
+    monkeypatch.setattr(streaming_pipeline, "scrape_car_details_from_url",
+                        lambda url, make, unchanged=None: pages[url])
+    monkeypatch.setattr(ProgressJournal, "reset", lambda self: None)  # Keep the journal to inspect it
+    journal_file = str(tmp_path / "progress.db")
+    output_dir = str(tmp_path / "details")
+    streaming_pipeline.stream_car_details(["bmw"], detail_workers=2, output_dir=output_dir,
+                                          journal_file=journal_file)
+
+    journal = ProgressJournal(journal_file)
+    assert journal.is_completed("https://a/offers/new")
+    assert journal.is_completed("https://a/offers/unchanged")
+    assert not journal.is_completed("https://a/offers/failed")
+    journal.close()
+    assert pq.read_table(output_dir).column("url").to_pylist() == ["https://a/offers/new"]
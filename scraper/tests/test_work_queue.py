@@ -0,0 +1,100 @@
+from utils.work_queue import WorkQueue, SqliteWorkQueue, CRAWL_QUEUE, DETAILS_QUEUE
+import pyarrow.parquet as pq
+import requests_scraper
+import pytest
+import time
+
+
+def test_work_queue_is_abstract():
+    with pytest.raises(TypeError):
+        WorkQueue()
+
+
+def test_leases_are_exclusive_and_acked_by_their_owner(tmp_path):
+    database_file = str(tmp_path / "queue.db")
+    first, second = SqliteWorkQueue(database_file), SqliteWorkQueue(database_file)
+    assert first.put(DETAILS_QUEUE, [("a", {"url": "a"}, 0), ("b", {"url": "b"}, 1)]) == 2
+    assert first.put(DETAILS_QUEUE, [("a", {"url": "a"}, 0)]) == 0  # Known key
+
+    leased = first.lease(DETAILS_QUEUE, 1)
+    assert [payload for _, payload in leased] == [{"url": "a"}]  # Lowest priority first
+    assert [payload for _, payload in second.lease(DETAILS_QUEUE, 5)] == [{"url": "b"}]
+    assert second.lease(DETAILS_QUEUE, 5) == []
+
+    second.ack([leased[0][0]])  # Not second's lease
+    assert first.counts(DETAILS_QUEUE) == {"leased": 2}
+    first.ack([leased[0][0]])
+    assert first.counts(DETAILS_QUEUE) == {"done": 1, "leased": 1}
+    first.close()
+    second.close()
+
+
+def test_nack_retries_until_given_up_and_expired_leases_return(tmp_path):
+    work_queue = SqliteWorkQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    work_queue.put(CRAWL_QUEUE, [("task", {}, 0)])
+
+    task_id = work_queue.lease(CRAWL_QUEUE)[0][0]
+    work_queue.nack([task_id], delay=60)
+    assert work_queue.lease(CRAWL_QUEUE) == []  # Not before the delay
+    assert not work_queue.is_drained(CRAWL_QUEUE)
+
+    work_queue.conn.execute("UPDATE tasks SET available_at = 0")
+    task_id = work_queue.lease(CRAWL_QUEUE, visibility_timeout=0)[0][0]
+    time.sleep(0.01)
+    assert work_queue.requeue_expired() == 1  # Second attempt expired: given up
+    assert work_queue.counts(CRAWL_QUEUE) == {"failed": 1}
+    assert work_queue.is_drained(CRAWL_QUEUE)
+
+    assert work_queue.reset(CRAWL_QUEUE) == 1
+    assert work_queue.put(CRAWL_QUEUE, [("task", {}, 0)]) == 1  # A new run can queue it again
+    work_queue.close()
+
+
+def test_detail_workers_ack_records_and_unchanged_pages_and_retry_failures(monkeypatch, tmp_path):
+    calls = {}
+
+    def scrape_car_details_from_url(url, make, unchanged=None):
+        calls[url] = calls.get(url, 0) + 1
+        if url.endswith("unchanged"):
+            return unchanged
+        if url.endswith("failing") or (url.endswith("flaky") and calls[url] == 1):
+            return None
+        return {"url": url, "make": make, "car_title": "BMW"}
+
+    monkeypatch.setattr(requests_scraper, "scrape_car_details_from_url", scrape_car_details_from_url)
+    work_queue = SqliteWorkQueue(str(tmp_path / "queue.db"), max_attempts=3)
+    urls = ["https://a/offers/ok", "https://a/offers/unchanged", "https://a/offers/flaky", "https://a/offers/failing"]
+    requests_scraper.queue_detail_links(work_queue, "bmw", urls)
+
+    requests_scraper.scrape_car_details_from_queue(
+        work_queue, workers=1, output_dir=str(tmp_path / "details"), retry_delay=0, poll_interval=0.01)
+
+    assert work_queue.counts(DETAILS_QUEUE) == {"done": 3, "failed": 1}
+    assert calls["https://a/offers/flaky"] == 2
+    assert calls["https://a/offers/failing"] == 3
+    urls_written = pq.read_table(str(tmp_path / "details")).column("url").to_pylist()
+    assert sorted(urls_written) == ["https://a/offers/flaky", "https://a/offers/ok"]
+    work_queue.close()
+
+
+def test_detail_workers_wait_for_pending_crawl_tasks(monkeypatch, tmp_path):
+    monkeypatch.setattr(requests_scraper, "scrape_car_details_from_url",
+                        lambda url, make, unchanged=None: {"url": url, "make": make})
+    work_queue = SqliteWorkQueue(str(tmp_path / "queue.db"))
+    work_queue.put(CRAWL_QUEUE, [("plan:bmw", {}, 0)])
+    sleeps = []
+
+    def sleep(seconds):
+        # The crawl task finishes while the detail worker waits, queueing a link
+        sleeps.append(seconds)
+        task_id = work_queue.lease(CRAWL_QUEUE)[0][0]
+        requests_scraper.queue_detail_links(work_queue, "bmw", ["https://a/offers/late"])
+        work_queue.ack([task_id])
+
+    monkeypatch.setattr(requests_scraper.time, "sleep", sleep)
+    requests_scraper.scrape_car_details_from_queue(
+        work_queue, workers=1, output_dir=str(tmp_path / "details"))
+
+    assert len(sleeps) == 1
+    assert work_queue.counts(DETAILS_QUEUE) == {"done": 1}
+    work_queue.close()
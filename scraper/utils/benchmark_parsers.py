@@ -0,0 +1,80 @@
+from utils.car_details_scraper import scrape_car_details_from_soup, scrape_car_details_from_html
+from utils.html_parser import parse_html, PARSER_BACKENDS
+import time
+import sys
+import os
+
+
+def load_page_corpus(directory="page_corpus"):
+    """Loads the saved detail pages (*.html) of a directory as raw bytes."""
+    pages = {}
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".html"):
+            with open(os.path.join(directory, filename), 'rb') as f:
+                pages[filename] = f.read()
+    return pages
+
+
+def benchmark_parsers(directory="page_corpus", backends=None, repeat=3):
+    """
+    Parses and extracts every saved page with each backend, checking that the
+    field values match the html.parser output and reporting the time per page.
+    """
+    pages = load_page_corpus(directory)
+    if not pages:
+        print(f"No saved pages found in {directory}")
+        return {}
+    backends = backends or PARSER_BACKENDS
+    reference = {name: scrape_car_details_from_soup(parse_html(html, "html.parser"))
+                 for name, html in pages.items()}
+
+    timings = {}
+    for backend in backends:
+        try:
+            mismatches = 0
+            for name, html in pages.items():
+                details = scrape_car_details_from_soup(parse_html(html, backend))
+                if details != reference[name]:
+                    mismatches += 1
+                    differing = [key for key in (reference[name] or {})
+                                 if (details or {}).get(key) != reference[name][key]]
+                    print(f"- {backend}: {name} differs in {differing}")
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for html in pages.values():
+                    scrape_car_details_from_soup(parse_html(html, backend))
+            per_page = (time.perf_counter() - start) / (repeat * len(pages))
+            timings[backend] = per_page
+            print(
+                f"{backend:>12}: {per_page * 1000:7.2f} ms/page, {mismatches} mismatching page(s)")
+        except ValueError as e:
+            print(f"{backend:>12}: skipped ({e})")
+
+    if "html.parser" in timings:
+        for backend, per_page in timings.items():
+            print(
+                f"- {backend} speedup over html.parser: {timings['html.parser'] / per_page:.1f}x")
+    return timings
+
+
+def compare_extraction_modes(directory="page_corpus"):
+    """Checks that the embedded JSON extraction gives the same field values as the DOM extractor."""
+    pages = load_page_corpus(directory)
+    for mode in ["dom", "json"]:
+        start = time.perf_counter()
+        for html in pages.values():
+            scrape_car_details_from_html(html, mode)
+        per_page = (time.perf_counter() - start) / max(len(pages), 1)
+        print(f"{mode:>12}: {per_page * 1000:7.2f} ms/page")
+    for name, html in pages.items():
+        dom = scrape_car_details_from_html(html, "dom") or {}
+        from_json = scrape_car_details_from_html(html, "json") or {}
+        differing = [key for key in dom if from_json.get(key) != dom[key]]
+        if differing:
+            print(f"- {name} differs in {differing}")
+
+
+if __name__ == "__main__":
+    benchmark_parsers(*sys.argv[1:2])
+    compare_extraction_modes(*sys.argv[1:2])
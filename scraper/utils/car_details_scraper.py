@@ -1,6 +1,10 @@
-from bs4 import BeautifulSoup
-from datetime import datetime
-import re
+from utils.html_parser import as_html_node, parse_html
+from utils.listing_json_scraper import extract_listing_json, scrape_car_details_from_json
+from utils.normalize import parse_int, parse_price, parse_power_hp, parse_fuel_consumption, parse_year_month
+import os
+
+
+EXTRACTION_MODES = ["dom", "json"]
 
 
 class ElementNotFoundError(Exception):
@@ -11,31 +15,83 @@ class ElementNotFoundError(Exception):
         self.message = message
 
 
+def default_extraction_mode():
+    """
+    Returns the extraction mode set in the SCRAPER_EXTRACTION environment variable,
+    "dom" by default: the JSON key paths are not yet checked against saved live pages.
+    """
+    return os.environ.get("SCRAPER_EXTRACTION", "dom")
+
+
+def scrape_car_details_from_html(html, extraction=None, backend=None):
+    """
+    Scrapes car details from the raw HTML of a detail page. In "json" mode the
+    listing is read from the embedded page JSON, without building a DOM, falling
+    back to the DOM extractor when the JSON is missing. "dom" always uses the DOM.
+    """
+    extraction = extraction or default_extraction_mode()
+    if extraction not in EXTRACTION_MODES:
+        raise ValueError(
+            f"Unknown extraction mode '{extraction}', choose one of {EXTRACTION_MODES}")
+    if extraction == "json":
+        listing = extract_listing_json(html)
+        if listing is not None:
+            car_data = scrape_car_details_from_json(listing)
+            if car_data and (car_data["car_title"] or car_data["price"] is not None):
+                return car_data
+    return scrape_car_details_from_soup(parse_html(html, backend))
+
+
+def scrape_car_record_from_html(html, url, make):
+    """Scrapes the full car record (url, make and car details) from the raw HTML of a detail page."""
+    car_data = scrape_car_details_from_html(html)
+    if car_data is None:
+        return None
+    return {"url": url, "make": make} | car_data
+
+
+def scrape_car_records_from_pages(pages, make):
+    """Scrapes the car records of a batch of (url, html) pages, skipping pages that fail."""
+    records = []
+    for url, html in pages:
+        try:
+            record = scrape_car_record_from_html(html, url, make)
+            if record:
+                records.append(record)
+        except Exception as e:
+            print(f"An error occurred while parsing {url}: {e}")
+    return records
+
+
 def scrape_car_details_from_soup(soup):
-    """Scrapes car details from a soup object, retuning a tuple of car details."""
+    """Scrapes car details from a parsed page (HtmlNode or BeautifulSoup), retuning a tuple of car details."""
     try:
         # First  check that the soup object is valid
-        if not soup or not isinstance(soup, BeautifulSoup):
+        if soup is None:
             raise ValueError("Invalid soup object provided")
+        soup = as_html_node(soup)
 
         # Check that the car listing still exists
-        no_longer_exists = soup.find(string="This listing no longer exists.")
+        no_longer_exists = soup.has_string("This listing no longer exists.")
         if no_longer_exists:
             print("\n!!! This listing no longer exists !!!\n")
             return None
 
+        # Index all <dt>/<dd> pairs and section headers in a single pass
+        index = build_page_index(soup)
+
         # Scrape car details
         car_title = scrape_car_title(soup)
         price = scrape_price(soup)
         seller = scrape_seller(soup)
         location = scrape_location(soup)
         num_images = scrape_num_images(soup)
-        basic_data = scrape_basic_data(soup)
-        vehicle_history = scrape_vehicle_history(soup)
-        technical_data = scrape_technical_data(soup)
-        energy_consumption = scrape_energy_consumption(soup)
-        equipment = scrape_equipment(soup)
-        colour_and_upholstery = scrape_colour_and_upholstery(soup)
+        basic_data = scrape_basic_data(soup, index)
+        vehicle_history = scrape_vehicle_history(soup, index)
+        technical_data = scrape_technical_data(soup, index)
+        energy_consumption = scrape_energy_consumption(soup, index)
+        equipment = scrape_equipment(soup, index)
+        colour_and_upholstery = scrape_colour_and_upholstery(soup, index)
 
         # Prepare data for database insertion
         car_data = {
@@ -55,14 +111,14 @@ def scrape_relative_div(soup, target_text):
     """Scrape the div relative to the target text."""
     try:
         # Find the element by its text content
-        target_element = soup.find(lambda tag: tag.string == target_text)
+        target_element = soup.find_by_string(target_text)
 
         if target_element:
             # Navigate to the sibling div (two divs below)
             sibling_div = target_element.find_next('div').find_next('div')
 
             if sibling_div:
-                return sibling_div.text.strip()
+                return sibling_div.text().strip()
             else:
                 return None
         else:
@@ -73,61 +129,47 @@ def scrape_relative_div(soup, target_text):
         return None
 
 
-def scrape_dt_dd(soup, target_text):
-    """Scrape the dt and dd elements relative to the target text."""
-    try:
-        # Find the <dt> element with the target text
-        dt_element = soup.find('dt', string=target_text)
+def build_page_index(soup):
+    """Walks the document once, collecting every <dt> label with its <dd> text and <li> items,
+    as well as the texts of all <h2> section headers."""
+    fields = {}
+    sections = set()
+    pending_labels = []  # <dt> labels still waiting for their <dd>
+    soup = as_html_node(soup)
+    for element in soup.find_all('h2, dt, dd'):
+        if element.tag == 'h2':
+            sections.add(element.text(strip=True))
+        elif element.tag == 'dt':
+            pending_labels.append(element.text(strip=True))
+        elif pending_labels:
+            entry = {
+                "text": element.text().strip(),
+                "items": [li.text().strip() for li in element.find_all('li')]
+            }
+            for label in pending_labels:
+                # Keep the first occurrence, like soup.find would
+                fields.setdefault(label, entry)
+            pending_labels = []
+    return {"fields": fields, "sections": sections}
 
-        if dt_element:
-            # Navigate to the corresponding <dd> element
-            dd_element = dt_element.find_next('dd')
 
-            if dd_element:
-                return dd_element.text.strip()
-            else:
-                raise ElementNotFoundError(
-                    f"<dd> not found in the soup object for <dt> with text '{target_text}'")
-        else:
-            raise ElementNotFoundError(
-                f"<dt> with text '{target_text}' not found in the soup object")
-    except ElementNotFoundError as e:
-        # print(f"\n!!! Element not found: {e.message} !!!\n")
-        return None
-    except Exception as e:
-        print(f"An error occurred: {e}")
+def scrape_dt_dd(index, target_text):
+    """Look up the <dd> text for the <dt> with the target text in the page index."""
+    entry = index["fields"].get(target_text)
+    if entry is None:
         return None
+    return entry["text"]
 
 
-def scrape_dt_dd_li(soup, target_text):
-    """Scrape the dt and dd elements relative to the target text."""
-    try:
-        dt_elements = soup.find_all('dt')
-        for dt in dt_elements:
-            # print(f"dt: {dt.text.strip()}")
-            if dt.get_text(strip=True) == target_text:
-                # Navigate to the corresponding <dd> element
-                dd_element = dt.find_next('dd')
-
-                if dd_element:
-                    li_elements = dd_element.find_all('li')
-                    string_representation = ";".join(
-                        [li.text.strip() for li in li_elements])
-                    # print(f"dd: {string_representation}")
-                    if string_representation:
-                        return string_representation
-                    else:
-                        return None
-                else:
-                    raise ElementNotFoundError(
-                        f"<dd> not found in the soup object for <dt> with text '{target_text}'")
-        raise ElementNotFoundError(
-            f"<dt> with text '{target_text}' not found in the soup object")
-    except ElementNotFoundError as e:
-        # print(f"\n!!! Element not found: {e.message} !!!\n")
+def scrape_dt_dd_li(index, target_text):
+    """Look up the <li> items for the <dt> with the target text in the page index, as a list."""
+    entry = index["fields"].get(target_text)
+    if entry is None:
         return None
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    items = [item for item in entry["items"] if item]
+    if items:
+        return items
+    else:
         return None
 
 
@@ -136,7 +178,7 @@ def scrape_car_title(soup):
     try:
         title = soup.find('h1').find('div').find('span')
         if title:
-            return title.text.strip()
+            return title.text().strip()
         else:
             raise ElementNotFoundError("Car title not found")
     except ElementNotFoundError as e:
@@ -150,12 +192,10 @@ def scrape_car_title(soup):
 def scrape_price(soup):
     """Scrape the car price from the soup object."""
     try:
-        price = soup.find(
-            'span', {'class': 'PriceInfo_price__XU0aF'}).text.strip()
+        price = soup.find('span.PriceInfo_price__XU0aF').text().strip()
         if price:
             # Extract the numeric part of the price
-            price_numeric = re.sub(r'[^\d]', '', price.split(".")[0])
-            return int(price_numeric)
+            return parse_price(price)
         else:
             raise ElementNotFoundError("Car price not found")
     except ElementNotFoundError as e:
@@ -201,11 +241,10 @@ def scrape_seller(soup):
 def scrape_location(soup):
     """Scrapes the location from the soup object."""
     try:
-        location = soup.find(
-            "a", {"class": "LocationWithPin_locationItem__tK1m5"})
+        location = soup.find("a.LocationWithPin_locationItem__tK1m5")
         if location:
             # print("Location:", location)
-            return location.text.strip()
+            return location.text().strip()
         else:
             raise ElementNotFoundError("Location not found")
     except ElementNotFoundError as e:
@@ -219,8 +258,7 @@ def scrape_location(soup):
 def scrape_num_images(soup):
     """Scrapes the number of images from the soup object."""
     try:
-        num_images = soup.find(
-            'span', {'class': 'image-gallery-index-total'}).text.strip()
+        num_images = soup.find('span.image-gallery-index-total').text().strip()
         if num_images and num_images.isdigit():
             return int(num_images)
         else:
@@ -233,13 +271,13 @@ def scrape_num_images(soup):
         return None
 
 
-def scrape_basic_data(soup):
+def scrape_basic_data(soup, index=None):
     """Scrapes the basic data section of the car from the soup object."""
     try:
         # Check if Basic data section exists
-        basic_data_section = soup.find(
-            'h2', string="Basic Data")
-        if not basic_data_section:
+        if index is None:
+            index = build_page_index(soup)
+        if "Basic Data" not in index["sections"]:
             # print("\n!!! Basic data section not found !!!\n")
             return {
                 "body_type": None,
@@ -251,13 +289,13 @@ def scrape_basic_data(soup):
                 "model_code": None
             }
 
-        body_type = scrape_dt_dd(soup, "Body type")
-        used_type = scrape_dt_dd(soup, "Type")
-        drivetrain = scrape_dt_dd(soup, "Drivetrain")
-        seats = scrape_dt_dd(soup, "Seats")
-        doors = scrape_dt_dd(soup, "Doors")
-        country_version = scrape_dt_dd(soup, "Country version")
-        model_code = scrape_dt_dd(soup, "Model code")
+        body_type = scrape_dt_dd(index, "Body type")
+        used_type = scrape_dt_dd(index, "Type")
+        drivetrain = scrape_dt_dd(index, "Drivetrain")
+        seats = parse_int(scrape_dt_dd(index, "Seats"))
+        doors = parse_int(scrape_dt_dd(index, "Doors"))
+        country_version = scrape_dt_dd(index, "Country version")
+        model_code = scrape_dt_dd(index, "Model code")
 
         return {
             "body_type": body_type,
@@ -281,13 +319,13 @@ def scrape_basic_data(soup):
         }
 
 
-def scrape_vehicle_history(soup):
+def scrape_vehicle_history(soup, index=None):
     """Scrapes the vehicle history section of the car from the soup object."""
     try:
         # Check if Vehicle History section exists
-        basic_data_section = soup.find(
-            'h2', string="Vehicle History")
-        if not basic_data_section:
+        if index is None:
+            index = build_page_index(soup)
+        if "Vehicle History" not in index["sections"]:
             # print("\n!!! Vehicle History section not found !!!\n")
             return {
                 "mileage": None,
@@ -299,24 +337,19 @@ def scrape_vehicle_history(soup):
             }
 
         # Mileage - Turned to numeric value
-        mileage = scrape_dt_dd(soup, "Mileage")
-        if mileage:
-            mileage = int(mileage.split(" ")[0].replace(",", ""))
-        # First registration - Turned to ISO format
-        first_registration = scrape_dt_dd(soup, "First registration")
-        if first_registration:
-            month, year = map(int, first_registration.split('/'))
-            iso_date = f"{year:04d}-{month:02d}"
-            first_registration = iso_date
-        general_inspection = scrape_dt_dd(soup, "General inspection")
+        mileage = parse_int(scrape_dt_dd(index, "Mileage"))
+        # First registration - Turned to the date of the first day of the month
+        first_registration = parse_year_month(
+            scrape_dt_dd(index, "First registration"))
+        general_inspection = scrape_dt_dd(index, "General inspection")
         # Previous owner - Turned to numeric value
-        previous_owner = scrape_dt_dd(soup, "Previous owner")
+        previous_owner = scrape_dt_dd(index, "Previous owner")
         if previous_owner and previous_owner.isdigit():
             previous_owner = int(previous_owner)
         else:
             previous_owner = None
-        full_service_history = scrape_dt_dd(soup, "Full service history")
-        non_smoker_service = scrape_dt_dd(soup, "Non-smoker service")
+        full_service_history = scrape_dt_dd(index, "Full service history")
+        non_smoker_service = scrape_dt_dd(index, "Non-smoker service")
 
         return {
             "mileage": mileage,
@@ -338,13 +371,13 @@ def scrape_vehicle_history(soup):
         }
 
 
-def scrape_technical_data(soup):
+def scrape_technical_data(soup, index=None):
     """Scrapes the technical data section of the car from the soup object."""
     try:
         # Check if Technical Data section exists
-        technical_data_section = soup.find(
-            'h2', string="Technical Data")
-        if not technical_data_section:
+        if index is None:
+            index = build_page_index(soup)
+        if "Technical Data" not in index["sections"]:
             # print("\n!!! Technical Data section not found !!!\n")
             return {
                 "power": None,
@@ -356,20 +389,14 @@ def scrape_technical_data(soup):
             }
 
         # Power - Turned to numeric value
-        power = scrape_dt_dd(soup, "Power")
-        if power:
-            power = int(re.search(r'\((\d+)\s*hp\)', power).group(1))
-        gearbox = scrape_dt_dd(soup, "Gearbox")
-        # Engine size - Turned to numeric value
-        engine_size = scrape_dt_dd(soup, "Engine size")
-        if engine_size:  # In cc
-            engine_size = int(engine_size.split(" ")[0].replace(",", ""))
-        gears = scrape_dt_dd(soup, "Gears")
-        cylinders = scrape_dt_dd(soup, "Cylinders")
-        # Empty weight - Turned to numeric value
-        empty_weight = scrape_dt_dd(soup, "Empty weight")
-        if empty_weight:  # In kg
-            empty_weight = int(empty_weight.split(" ")[0].replace(",", ""))
+        power = parse_power_hp(scrape_dt_dd(index, "Power"))
+        gearbox = scrape_dt_dd(index, "Gearbox")
+        # Engine size - Turned to numeric value, in cc
+        engine_size = parse_int(scrape_dt_dd(index, "Engine size"))
+        gears = parse_int(scrape_dt_dd(index, "Gears"))
+        cylinders = parse_int(scrape_dt_dd(index, "Cylinders"))
+        # Empty weight - Turned to numeric value, in kg
+        empty_weight = parse_int(scrape_dt_dd(index, "Empty weight"))
 
         return {
             "power": power,
@@ -392,13 +419,13 @@ def scrape_technical_data(soup):
         }
 
 
-def scrape_energy_consumption(soup):
+def scrape_energy_consumption(soup, index=None):
     """Scrapes the energy consumption section of the car from the soup object."""
     try:
         # Check if Energy Consumption section exists
-        energy_consumption_section = soup.find(
-            'h2', string="Energy Consumption")
-        if not energy_consumption_section:
+        if index is None:
+            index = build_page_index(soup)
+        if "Energy Consumption" not in index["sections"]:
             # print("\n!!! Energy Consumption section not found !!!\n")
             return {
                 "fuel_type": None,
@@ -411,17 +438,13 @@ def scrape_energy_consumption(soup):
 
         # Fuel Type
         fuel_type = scrape_fuel_type(soup)
-        fuel_consumption = scrape_dt_dd(soup, "Fuel consumption")
-        emission_class = scrape_dt_dd(soup, "Emission class")
-        emissions_sticker = scrape_dt_dd(soup, "Emissions sticker")
-        co2_emissions = scrape_dt_dd(soup, "CO₂-emissions")
-        if co2_emissions:
-            co2_emissions = int(co2_emissions.split(
-                " ")[0].replace(",", "").replace(".", ""))
-        electric_range = scrape_dt_dd(soup, "Electric range")
-        if electric_range:
-            electric_range = int(electric_range.split(
-                " ")[0].replace(",", "").replace(".", ""))
+        # Fuel consumption - Turned to combined l/100 km
+        fuel_consumption = parse_fuel_consumption(
+            scrape_dt_dd(index, "Fuel consumption"))
+        emission_class = scrape_dt_dd(index, "Emission class")
+        emissions_sticker = scrape_dt_dd(index, "Emissions sticker")
+        co2_emissions = parse_int(scrape_dt_dd(index, "CO₂-emissions"))
+        electric_range = parse_int(scrape_dt_dd(index, "Electric range"))
 
         return {
             "fuel_type": fuel_type,
@@ -444,14 +467,14 @@ def scrape_energy_consumption(soup):
         }
 
 
-def scrape_equipment(soup):
+def scrape_equipment(soup, index=None):
     """Scrapes the equipment section of the car from the soup object."""
     try:
         # print("\nScraping Equipment section...\n")
         # Check if Equipment section exists
-        equipment_section = soup.find(
-            'h2', string="Equipment")
-        if not equipment_section:
+        if index is None:
+            index = build_page_index(soup)
+        if "Equipment" not in index["sections"]:
             # print("\n!!! Equipment section not found !!!\n")
             return {
                 "comfort_and_convenience": None,
@@ -461,11 +484,11 @@ def scrape_equipment(soup):
             }
 
         comfort_and_convenience = scrape_dt_dd_li(
-            soup, "Comfort & Convenience")
+            index, "Comfort & Convenience")
         entertainment_and_media = scrape_dt_dd_li(
-            soup, "Entertainment & Media")
-        safety_and_security = scrape_dt_dd_li(soup, "Safety & Security")
-        extras = scrape_dt_dd_li(soup, "Extras")
+            index, "Entertainment & Media")
+        safety_and_security = scrape_dt_dd_li(index, "Safety & Security")
+        extras = scrape_dt_dd_li(index, "Extras")
 
         return {
             "comfort_and_convenience": comfort_and_convenience,
@@ -484,13 +507,13 @@ def scrape_equipment(soup):
         }
 
 
-def scrape_colour_and_upholstery(soup):
+def scrape_colour_and_upholstery(soup, index=None):
     """Scrapes the colour and upholstery section of the car from the soup object."""
     try:
         # Check if Colour & Upholstery section exists
-        colour_and_upholstery_section = soup.find(
-            'h2', string="Colour and Upholstery")
-        if not colour_and_upholstery_section:
+        if index is None:
+            index = build_page_index(soup)
+        if "Colour and Upholstery" not in index["sections"]:
             # print("\n!!! Colour and Upholstery section not found !!!\n")
             return {
                 "exterior_colour": None,
@@ -500,11 +523,11 @@ def scrape_colour_and_upholstery(soup):
                 "upholstery": None
             }
 
-        exterior_colour = scrape_dt_dd(soup, "Colour")
-        manufacturer_colour = scrape_dt_dd(soup, "Manufacturer colour")
-        paint = scrape_dt_dd(soup, "Paint")
-        upholstery_colour = scrape_dt_dd(soup, "Upholstery colour")
-        upholstery = scrape_dt_dd(soup, "Upholstery")
+        exterior_colour = scrape_dt_dd(index, "Colour")
+        manufacturer_colour = scrape_dt_dd(index, "Manufacturer colour")
+        paint = scrape_dt_dd(index, "Paint")
+        upholstery_colour = scrape_dt_dd(index, "Upholstery colour")
+        upholstery = scrape_dt_dd(index, "Upholstery")
 
         return {
             "exterior_colour": exterior_colour,
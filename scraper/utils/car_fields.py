@@ -0,0 +1,26 @@
+# Field names of the car detail records, without pyarrow, for modules that only
+# build records (the typed columns are in `utils/car_schema.py`, in the same order)
+
+# Equipment categories, stored as item lists and as the raw ';'-joined text (`<category>_raw`)
+EQUIPMENT_COLUMNS = ["comfort_and_convenience", "entertainment_and_media",
+                     "safety_and_security", "extras"]
+
+# Keys of a car detail record, in column order
+CAR_DETAILS_FIELDS = [
+    "url", "car_title", "price", "seller", "location", "num_images",
+    # Basic data
+    "body_type", "used_type", "drivetrain", "seats", "doors", "country_version", "model_code",
+    # Vehicle history
+    "mileage", "first_registration", "general_inspection", "previous_owner",
+    "full_service_history", "non_smoker_service",
+    # Technical data
+    "power", "gearbox", "engine_size", "gears", "cylinders", "empty_weight",
+    # Energy consumption
+    "fuel_type", "fuel_consumption", "emission_class", "emissions_sticker",
+    "co2_emissions", "electric_range",
+    # Equipment
+    *EQUIPMENT_COLUMNS,
+    *[f"{column}_raw" for column in EQUIPMENT_COLUMNS],
+    # Colour and upholstery
+    "exterior_colour", "manufacturer_colour", "paint", "upholstery_colour", "upholstery",
+]
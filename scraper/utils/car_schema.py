@@ -0,0 +1,67 @@
+from utils.car_fields import EQUIPMENT_COLUMNS
+import pyarrow as pa
+
+
+# Low-cardinality text columns, dictionary-encoded so each distinct value is stored once per chunk
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Equipment item lists, each item dictionary-encoded against the distinct equipment names
+EQUIPMENT = pa.list_(CATEGORY)
+
+# Partition columns of the car details dataset, stored in the directory names
+PARTITION_COLUMNS = ["make", "scrape_date"]
+
+# Typed columns of the car detail records, as produced by the extractors and written to Parquet
+# (named like `CAR_DETAILS_FIELDS` in `utils/car_fields.py`)
+CAR_DETAILS_SCHEMA = pa.schema([
+    ("url", pa.string()),
+    ("car_title", pa.string()),
+    ("price", pa.int64()),
+    ("seller", CATEGORY),
+    ("location", pa.string()),
+    ("num_images", pa.int64()),
+    # Basic data
+    ("body_type", CATEGORY),
+    ("used_type", CATEGORY),
+    ("drivetrain", CATEGORY),
+    ("seats", pa.int64()),
+    ("doors", pa.int64()),
+    ("country_version", CATEGORY),
+    ("model_code", pa.string()),
+    # Vehicle history
+    ("mileage", pa.int64()),
+    ("first_registration", pa.date32()),
+    ("general_inspection", pa.string()),
+    ("previous_owner", pa.int64()),
+    ("full_service_history", CATEGORY),
+    ("non_smoker_service", CATEGORY),
+    # Technical data
+    ("power", pa.int64()),
+    ("gearbox", CATEGORY),
+    ("engine_size", pa.int64()),
+    ("gears", pa.int64()),
+    ("cylinders", pa.int64()),
+    ("empty_weight", pa.int64()),
+    # Energy consumption
+    ("fuel_type", CATEGORY),
+    ("fuel_consumption", pa.float64()),
+    ("emission_class", CATEGORY),
+    ("emissions_sticker", CATEGORY),
+    ("co2_emissions", pa.int64()),
+    ("electric_range", pa.int64()),
+    # Equipment
+    ("comfort_and_convenience", EQUIPMENT),
+    ("entertainment_and_media", EQUIPMENT),
+    ("safety_and_security", EQUIPMENT),
+    ("extras", EQUIPMENT),
+    ("comfort_and_convenience_raw", pa.string()),
+    ("entertainment_and_media_raw", pa.string()),
+    ("safety_and_security_raw", pa.string()),
+    ("extras_raw", pa.string()),
+    # Colour and upholstery
+    ("exterior_colour", CATEGORY),
+    ("manufacturer_colour", pa.string()),
+    ("paint", CATEGORY),
+    ("upholstery_colour", CATEGORY),
+    ("upholstery", CATEGORY),
+])
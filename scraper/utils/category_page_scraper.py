@@ -1,19 +1,114 @@
-from bs4 import BeautifulSoup
+from utils.html_parser import as_html_node
+from utils.normalize import parse_int, parse_price, parse_power_hp, parse_year_month
+from utils.car_fields import CAR_DETAILS_FIELDS
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+
+
+# The result list shows 20 offers per page and at most 20 pages
+RESULTS_PER_PAGE = 20
+MAX_RESULT_PAGES = 20
+MAX_LISTED_OFFERS = RESULTS_PER_PAGE * MAX_RESULT_PAGES
+# Upper bound of the power filter in kw, above any listed car
+MAX_POWER_KW = 2000
+
+# Codes of the data-* attributes of a result article
+SELLER_TYPES = {"d": "Dealer", "p": "Private seller"}
+FUEL_TYPE_CODES = {
+    "B": "Gasoline", "D": "Diesel", "E": "Electric", "2": "Electric/Gasoline",
+    "3": "Electric/Diesel", "L": "LPG", "C": "CNG", "H": "Hydrogen",
+    "M": "Ethanol", "O": "Others",
+}
+# Icon name of a card detail (data-testid="VehicleDetails-<icon>") -> record key
+CARD_DETAIL_FIELDS = {
+    "mileage_road": "mileage",
+    "calendar": "first_registration",
+    "speedometer": "power",
+    "gas_pump": "fuel_type",
+    "transmission": "gearbox",
+}
 
 
 def extract_car_links(soup, base_url):
     """Extracts links to car details pages from a category page,
     considering only articles with data-source="listpage_search-results"."""
-    links = []
+    soup = as_html_node(soup)
     # Find all article tags with the specified data-source attribute
     articles = soup.find_all(
-        'article', {'data-source': 'listpage_search-results'})
+        'article[data-source="listpage_search-results"]')
 
     # Iterate through the articles and find the <a> tags within them
+    hrefs = []
     for article in articles:
         a_tag = article.find('a')  # Find the first <a> tag in the article
-        if a_tag and 'href' in a_tag.attrs:
-            href = a_tag['href']
+        hrefs.append(a_tag.get('href') if a_tag else None)
+    return car_links_from_hrefs(hrefs, base_url)
+
+
+def extract_car_cards(soup, base_url):
+    """
+    Extracts a partial car record from every result article of a category page,
+    with the keys of `scrape_car_details_from_soup` (fields not on the card are None).
+    """
+    records = []
+    for article in as_html_node(soup).find_all('article[data-source="listpage_search-results"]'):
+        record = scrape_car_card(article, base_url)
+        if record:
+            records.append(record)
+    return records
+
+
+def scrape_car_card(article, base_url):
+    """Builds a partial car record from the data-* attributes and the details of a result article."""
+    try:
+        a_tag = article.find('a')
+        links = car_links_from_hrefs(
+            [a_tag.get('href') if a_tag else None], base_url)
+        if not links:
+            return None
+        record = dict.fromkeys(CAR_DETAILS_FIELDS)
+        record["url"] = links[0]
+        title = article.find('h2')
+        record["car_title"] = " ".join(title.text().split()) if title else \
+            " ".join(value for value in [article.get('data-make'), article.get('data-model')] if value) or None
+        record["price"] = parse_price(article.get('data-price'))
+        record["seller"] = SELLER_TYPES.get(
+            (article.get('data-seller-type') or '').lower())
+        address = article.find('[data-testid="sellerinfo-address"]')
+        record["location"] = address.text(strip=True) if address else article.get(
+            'data-listing-zip-code')
+        record["mileage"] = parse_int(article.get('data-mileage'))
+        record["first_registration"] = parse_year_month(
+            article.get('data-first-registration'))
+        record["fuel_type"] = FUEL_TYPE_CODES.get(
+            (article.get('data-fuel-type') or '').upper())
+
+        # Values only shown in the card details
+        for item in article.find_all('[data-testid^="VehicleDetails-"]'):
+            key = CARD_DETAIL_FIELDS.get(
+                item.get('data-testid', '')[len("VehicleDetails-"):])
+            value = item.text(strip=True)
+            if not key or not value or value == "-":
+                continue
+            if key == "power":
+                record["power"] = parse_power_hp(value)
+            elif key == "mileage" and record["mileage"] is None:
+                record["mileage"] = parse_int(value)
+            elif key == "first_registration" and record["first_registration"] is None:
+                record["first_registration"] = parse_year_month(value)
+            elif key in ("fuel_type", "gearbox") and record[key] is None:
+                record[key] = value
+        return record
+
+    except Exception as e:
+        print(f"An error occurred while scraping a result card: {e}")
+        return None
+
+
+def car_links_from_hrefs(hrefs, base_url):
+    """Turns the hrefs of result articles into absolute links to car details pages."""
+    links = []
+    for href in hrefs:
+        if href:
             if '/offers/' in href:  # Adjust this condition to match the car details URL pattern
                 absolute_url = base_url + \
                     href if not href.startswith('http') else href
@@ -21,8 +116,97 @@ def extract_car_links(soup, base_url):
     return links
 
 
+def extract_number_of_offers(soup):
+    """Extracts the number of offers from the header of a category page, or None if missing."""
+    h1_tag = as_html_node(soup).find('h1[data-testid="list-header-title"]')
+    if h1_tag is None:
+        return None
+    return parse_number_of_offers(h1_tag.text())
+
+
+def parse_number_of_offers(text):
+    """Parses the number of offers from the result header text ("1,234 Offers ...")."""
+    # Extract the number from the text
+    return int(text.strip().split(' ')[0].replace(',', ''))
+
+
+def build_page_url(category_url, page):
+    """Returns the category URL of a result page, setting its `page` query parameter."""
+    parts = urlsplit(category_url)
+    params = [(key, value) for key, value in parse_qsl(parts.query)
+              if key != 'page']
+    params.append(('page', page))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
 def extract_pages(soup, base_url):
     """Extracts pagination links from a category page."""
     pages = []
-    prev_next = soup.find_all('li', {'class': 'prev-next'})
+    prev_next = as_html_node(soup).find_all('li.prev-next')
     return pages
+
+
+def plan_power_ranges(make_url, count_offers, min_kw=1, max_kw=MAX_POWER_KW):
+    """
+    Splits the power range of a brand into ranges of at most `MAX_LISTED_OFFERS`
+    offers, so each range can be paginated completely. A range is only bisected
+    while its offer count is above the cap, then neighbouring small ranges are
+    merged again. `count_offers` returns the offer count of a category URL.
+    Returns a list of (min kw, max kw, offer count).
+    """
+    ranges = []
+    stack = [(min_kw, max_kw)]
+    while stack:
+        low_kw, high_kw = stack.pop()
+        if low_kw > high_kw:
+            continue
+        num_offers = count_offers(
+            build_filtered_url(make_url, low_kw, high_kw))
+        if num_offers is not None and num_offers > MAX_LISTED_OFFERS and low_kw < high_kw:
+            middle_kw = (low_kw + high_kw) // 2
+            # Upper half pushed first, so the ranges come out in ascending order
+            stack.append((middle_kw + 1, high_kw))
+            stack.append((low_kw, middle_kw))
+        else:
+            if num_offers is not None and num_offers > MAX_LISTED_OFFERS:
+                print(
+                    f"\n!!! {num_offers} offers at {low_kw} kw, only the first {MAX_LISTED_OFFERS} are listed. !!!\n")
+            ranges.append((low_kw, high_kw, num_offers))
+    return merge_power_ranges(ranges)
+
+
+def build_filtered_url(make_url, min_kw=None, max_kw=None):
+    """Builds the category URL of a brand, optionally filtered to a power range in kw (inclusive)."""
+    params = {
+        'atype': 'C',
+        'cy': 'D,A,B,E,F,I,L,NL',
+        'damaged_listing': 'exclude',
+        'desc': '0',
+        'sort': 'standard',
+        'source': 'homepage_search-mask',
+        'ustate': 'N,U'
+    }
+    if min_kw is not None:
+        params['powerfrom'] = min_kw
+    if max_kw is not None:
+        params['powerto'] = max_kw
+    if min_kw is not None or max_kw is not None:
+        params['powertype'] = 'kw'
+
+    url_params = urlencode(sorted(params.items()))
+    return urljoin(make_url, '?' + url_params)
+
+
+def merge_power_ranges(ranges):
+    """Merges neighbouring power ranges while their combined offer count stays within `MAX_LISTED_OFFERS`."""
+    merged = []
+    for low_kw, high_kw, num_offers in ranges:
+        if num_offers == 0:
+            continue  # Nothing to scrape
+        if merged:
+            last_low_kw, last_high_kw, last_offers = merged[-1]
+            if last_offers is not None and num_offers is not None and last_offers + num_offers <= MAX_LISTED_OFFERS:
+                merged[-1] = (last_low_kw, high_kw, last_offers + num_offers)
+                continue
+        merged.append((low_kw, high_kw, num_offers))
+    return merged
@@ -1,38 +1,49 @@
+from utils.link_store import LinkStore, LINK_STORE_FILE
 import os
 import json
 
 
-def consolidate_car_links(directory="car_links", output_file="all_car_links.json"):
+def consolidate_car_links(directory="car_links", database_file=LINK_STORE_FILE):
     """
-    Consolidates car links from individual brand files into a single JSON file,
+    Consolidates car links from individual brand files into the link store,
     preserving brand indexing.
     """
-    all_car_links = {}
+    store = LinkStore(database_file)
+    try:
+        for filename in os.listdir(directory):
+            if filename.endswith("_links.txt"):
+                brand = filename[:-10]  # Extract brand name from filename
+                filepath = os.path.join(directory, filename)
 
-    for filename in os.listdir(directory):
-        if filename.endswith("_links.txt"):
-            brand = filename[:-10]  # Extract brand name from filename
-            filepath = os.path.join(directory, filename)
+                try:
+                    with open(filepath, 'r') as f:
+                        added = store.add_links(brand, f)
+                    print(f"Successfully read {added} new links for {brand}")
 
-            try:
-                with open(filepath, 'r') as f:
-                    # Read links, removing whitespace
-                    links = {line.strip() for line in f if line.strip()}
-                all_car_links[brand] = list(links)
-                print(f"Successfully read {len(links)} links for {brand}")
+                except Exception as e:
+                    print(f"Error reading {filename}: {e}")
 
-            except Exception as e:
-                print(f"Error reading {filename}: {e}")
+        print(
+            f"All car links consolidated into {database_file} ({store.count_links()} links)")
+    finally:
+        store.close()
 
-    # Write all car links to a JSON file
-    try:
-        with open(output_file, 'w') as outfile:
-            # Use indent for readability
-            json.dump(all_car_links, outfile, indent=4)
-        print(f"All car links consolidated into {output_file}")
 
+def import_car_links_json(file_path="../all_car_links.json", database_file=LINK_STORE_FILE):
+    """Imports an existing `all_car_links.json` ({make: [links]}) into the link store."""
+    try:
+        with open(file_path, "r") as file:
+            data = json.load(file)
     except Exception as e:
-        print(f"Error writing to {output_file}: {e}")
+        print(f"An error occurred while reading {file_path}: {e}")
+        return
+    store = LinkStore(database_file)
+    try:
+        for make, links in data.items():
+            added = store.add_links(make, links)
+            print(f"Imported {added} new links for {make}")
+    finally:
+        store.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+from utils.selenium_scraper_setup import setup_selenium_driver
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+import queue
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class PooledDriver:
+    """A warm browser of the pool, with the state that outlives a single lease."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.has_handled_consent = False  # Consent is declined once per browser
+        self.pages = 0  # Pages loaded since the browser started
+        self.start_memory_mb = browser_memory_mb(driver)
+
+    def is_healthy(self):
+        """Checks that the browser still responds."""
+        try:
+            return self.driver.execute_script("return 1") == 1
+        except Exception:
+            return False
+
+    def memory_growth_mb(self):
+        """Memory grown since the browser started, or None if it cannot be measured."""
+        memory_mb = browser_memory_mb(self.driver)
+        if memory_mb is None or self.start_memory_mb is None:
+            return None
+        return memory_mb - self.start_memory_mb
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            print(f"An error occurred while quitting a browser: {e}")
+
+
+class DriverPool:
+    """
+    Pool of up to `size` warm Selenium drivers leased to crawl tasks. Browsers are
+    started on demand (or `prestart` of them up front) and then reused; a browser
+    is quit when it stops responding, after `max_pages` page loads or once its
+    memory grew by more than `max_memory_growth_mb`, and replaced when needed again.
+    A crawl whose pages are all fetched over HTTP never starts a browser.
+    """
+
+    def __init__(self, size, max_pages=500, max_memory_growth_mb=1024, create_driver=setup_selenium_driver, prestart=0):
+        self.max_size = size
+        self.max_pages = max_pages
+        self.max_memory_growth_mb = max_memory_growth_mb
+        self.create_driver = create_driver
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.size = 0  # Running browsers
+        self.starting = 0  # Browsers being started
+        if prestart:
+            # Chrome takes seconds to start, start the browsers at the same time
+            with ThreadPoolExecutor(max_workers=prestart) as executor:
+                for pooled in executor.map(lambda _: self.start_driver(), range(min(prestart, size))):
+                    if pooled:
+                        self.idle.put(pooled)
+            print(f"- Started {self.size} browsers.")
+
+    def start_driver(self):
+        """Starts a browser, returning None if it failed to start."""
+        try:
+            pooled = PooledDriver(self.create_driver())
+        except Exception as e:
+            print(f"An error occurred while starting a browser: {e}")
+            return None
+        with self.lock:
+            self.size += 1
+        return pooled
+
+    @contextmanager
+    def lease(self):
+        """Leases a driver for the duration of a `with` block."""
+        pooled = self.acquire()
+        try:
+            yield pooled
+        finally:
+            self.release(pooled)
+
+    def acquire(self):
+        """Takes an idle driver, starting one if the pool is not full yet, or waits for one to be released."""
+        while True:
+            try:
+                return self.idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self.lock:
+                can_start = self.size + self.starting < self.max_size
+                if can_start:
+                    self.starting += 1
+            if can_start:
+                try:
+                    pooled = self.start_driver()
+                finally:
+                    with self.lock:
+                        self.starting -= 1
+                if pooled:
+                    return pooled
+                with self.lock:
+                    if self.size == 0:
+                        raise RuntimeError("No browser could be started for the driver pool")
+            try:
+                return self.idle.get(timeout=5)
+            except queue.Empty:
+                continue
+
+    def release(self, pooled):
+        """Returns a driver to the pool, replacing it if it is worn out."""
+        reason = self.recycle_reason(pooled)
+        if reason is None:
+            self.idle.put(pooled)
+            return
+        print(f"Recycling a browser ({reason}).")
+        pooled.quit()
+        with self.lock:
+            self.size -= 1  # A fresh browser is started when one is needed again
+
+    def recycle_reason(self, pooled):
+        """Returns why a driver should be replaced, or None if it can be reused."""
+        if not pooled.is_healthy():
+            return "not responding"
+        if self.max_pages and pooled.pages >= self.max_pages:
+            return f"{pooled.pages} pages loaded"
+        if self.max_memory_growth_mb:
+            growth = pooled.memory_growth_mb()
+            if growth is not None and growth > self.max_memory_growth_mb:
+                return f"memory grew by {growth:.0f} MB"
+        return None
+
+    def close(self):
+        """Quits all idle browsers."""
+        while True:
+            try:
+                pooled = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            pooled.quit()
+            with self.lock:
+                self.size -= 1
+
+
+class LazyLease:
+    """Lease of a pool driver that is only taken from the pool when a task first needs a browser."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.pooled = None
+
+    def acquire(self):
+        """Returns the leased PooledDriver, taking one from the pool on the first call."""
+        if self.pooled is None:
+            self.pooled = self.pool.acquire()
+        return self.pooled
+
+    def release(self):
+        """Returns the driver to the pool, if one was taken."""
+        if self.pooled is not None:
+            pooled = self.pooled
+            self.pooled = None
+            self.pool.release(pooled)
+
+
+def browser_memory_mb(driver):
+    """
+    Resident memory of the browser in MB: the driver process and all its children
+    with psutil, otherwise the JS heap of the open page. None if unavailable.
+    """
+    try:
+        if psutil:
+            process = psutil.Process(driver.service.process.pid)
+            processes = [process] + process.children(recursive=True)
+            return sum(p.memory_info().rss for p in processes) / 2 ** 20
+        heap = driver.execute_script(
+            "return window.performance.memory ? window.performance.memory.usedJSHeapSize : null")
+        return heap / 2 ** 20 if heap else None
+    except Exception:
+        return None
@@ -0,0 +1,209 @@
+from utils.car_details_scraper import scrape_car_record_from_html
+from datetime import datetime, timezone
+import threading
+import hashlib
+import sqlite3
+import atexit
+import uuid
+import zlib
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Start a new segment file once the current one grows past this size
+SEGMENT_SIZE = 256 * 1024 * 1024
+
+
+def compress(content):
+    """Compresses a page with zstd if available, zlib otherwise, returning (codec, data)."""
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(content)
+    return "zlib", zlib.compress(content, 6)
+
+
+def decompress(codec, data):
+    """Decompresses a page stored with the given codec."""
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("Reading zstd pages requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def read_blob(directory, segment, offset, length, codec):
+    """Reads and decompresses a single stored page, usable from any process."""
+    with open(os.path.join(directory, segment), 'rb') as f:
+        f.seek(offset)
+        return decompress(codec, f.read(length))
+
+
+class HtmlArchive:
+    """
+    Append-only, content-addressed archive of raw detail pages.
+
+    Page bodies are compressed and appended to segment files, each distinct body
+    (by SHA-256) is stored once. A SQLite index maps every fetch (url, make,
+    fetch time) to the stored body.
+
+    Every archive instance appends to its own segment files (named after a random
+    writer ID), so processes and hosts sharing the directory never write to the
+    same file. Index rows are committed in batches of `commit_every` pages; bodies
+    of a crash's uncommitted rows stay unreferenced in the segment file.
+    """
+
+    def __init__(self, directory="html_archive", segment_size=SEGMENT_SIZE, commit_every=100):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.commit_every = commit_every
+        os.makedirs(directory, exist_ok=True)
+        self.lock = threading.Lock()
+        # Other processes may hold the write lock while committing their batch
+        self.conn = sqlite3.connect(os.path.join(
+            directory, "index.db"), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+        self.writer_id = uuid.uuid4().hex[:12]
+        self.segment_number = 1
+        self.segment = self.writer_segment_name()
+        self.pending_blobs = {}  # Digest -> blob row not committed yet
+        self.pending_pages = []
+
+    def create_tables(self):
+        """Creates the index tables if they don't exist yet."""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                segment TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                codec TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT NOT NULL,
+                make TEXT,
+                fetched_at TEXT NOT NULL,
+                digest TEXT NOT NULL REFERENCES blobs(digest)
+            );
+            CREATE INDEX IF NOT EXISTS pages_url ON pages(url, fetched_at);
+        """)
+        self.conn.commit()
+
+    def store(self, url, content, make=None, fetched_at=None):
+        """Stores a fetched page, writing the body only if it isn't archived yet. Returns its digest."""
+        digest = hashlib.sha256(content).hexdigest()
+        fetched_at = fetched_at or datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            exists = digest in self.pending_blobs or self.conn.execute(
+                "SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if not exists:
+                codec, data = compress(content)
+                path = os.path.join(self.directory, self.segment)
+                if os.path.exists(path) and os.path.getsize(path) >= self.segment_size:
+                    self.segment_number += 1
+                    self.segment = self.writer_segment_name()
+                    path = os.path.join(self.directory, self.segment)
+                with open(path, 'ab') as f:
+                    offset = f.tell()  # Only this archive instance appends to its segments
+                    f.write(data)
+                self.pending_blobs[digest] = (
+                    digest, self.segment, offset, len(data), codec)
+            self.pending_pages.append((url, make, fetched_at, digest))
+            if len(self.pending_pages) >= self.commit_every:
+                self.commit_index()
+        return digest
+
+    def writer_segment_name(self):
+        """File name of the current segment of this archive instance."""
+        return f"segment-{self.writer_id}-{self.segment_number:06d}.bin"
+
+    def commit_index(self):
+        """Commits the buffered index rows in one transaction (caller holds the lock)."""
+        if not self.pending_pages:
+            return
+        # Another writer may have stored the same body meanwhile, either copy is fine
+        self.conn.executemany("INSERT OR IGNORE INTO blobs VALUES (?, ?, ?, ?, ?)",
+                              list(self.pending_blobs.values()))
+        self.conn.executemany(
+            "INSERT INTO pages VALUES (?, ?, ?, ?)", self.pending_pages)
+        self.conn.commit()
+        self.pending_blobs = {}
+        self.pending_pages = []
+
+    def flush(self):
+        """Commits the index rows of the pages stored so far."""
+        with self.lock:
+            self.commit_index()
+
+    def load(self, digest):
+        """Returns the raw page body stored under a digest."""
+        self.flush()
+        segment, offset, length, codec = self.conn.execute(
+            "SELECT segment, offset, length, codec FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return read_blob(self.directory, segment, offset, length, codec)
+
+    def latest_pages(self, make=None):
+        """Yields (url, make, segment, offset, length, codec) of the latest fetch of every URL."""
+        self.flush()
+        query = """
+            SELECT p.url, p.make, b.segment, b.offset, b.length, b.codec
+            FROM pages p JOIN blobs b ON b.digest = p.digest
+            WHERE p.fetched_at = (SELECT MAX(fetched_at) FROM pages WHERE url = p.url)
+        """
+        params = ()
+        if make:
+            query += " AND p.make = ?"
+            params = (make,)
+        yield from self.conn.execute(query + " ORDER BY b.segment, b.offset", params)
+
+    def close(self):
+        """Commits the remaining index rows and closes the index connection."""
+        self.flush()
+        self.conn.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Returns the archive set in the SCRAPER_ARCHIVE_DIR environment variable, or None if archiving is off."""
+    global _archive
+    directory = os.environ.get("SCRAPER_ARCHIVE_DIR")
+    if not directory:
+        return None
+    with _archive_lock:
+        if _archive is None:
+            _archive = HtmlArchive(directory)
+            # The fetchers never close the shared archive, commit its last batch on exit
+            atexit.register(_archive.close)
+    return _archive
+
+
+def archive_page(url, content, make=None):
+    """Stores a fetched page in the archive if archiving is switched on."""
+    archive = get_archive()
+    if archive is None:
+        return
+    try:
+        archive.store(url, content, make)
+    except Exception as e:
+        print(f"An error occurred while archiving {url}: {e}")
+
+
+def extract_archived_pages(directory, entries):
+    """Scrapes the car records of a batch of archived pages, given as `latest_pages` rows."""
+    records = []
+    for url, make, segment, offset, length, codec in entries:
+        try:
+            html = read_blob(directory, segment, offset, length, codec)
+            record = scrape_car_record_from_html(html, url, make)
+            if record:
+                records.append(record)
+        except Exception as e:
+            print(f"An error occurred while re-extracting {url}: {e}")
+    return records
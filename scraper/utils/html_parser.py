@@ -0,0 +1,202 @@
+from bs4 import BeautifulSoup, Tag
+from abc import ABC, abstractmethod
+import os
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 - only needed as a BeautifulSoup tree builder
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+PARSER_BACKENDS = ["html.parser", "lxml", "selectolax"]
+
+
+def default_parser_backend():
+    """Returns the parser backend set in the SCRAPER_PARSER environment variable,
+    falling back to lxml if it is installed and to Python's html.parser otherwise."""
+    backend = os.environ.get("SCRAPER_PARSER")
+    if backend:
+        return backend
+    return "lxml" if HAS_LXML else "html.parser"
+
+
+def parse_html(html, backend=None):
+    """Parses HTML content (str or bytes) with the chosen backend, returning an HtmlNode."""
+    backend = backend or default_parser_backend()
+    if backend == "selectolax":
+        if LexborHTMLParser is None:
+            raise ValueError(
+                "The selectolax backend requires the selectolax package")
+        return LexborNode(LexborHTMLParser(html).root)
+    if backend == "lxml" and not HAS_LXML:
+        raise ValueError("The lxml backend requires the lxml package")
+    if backend not in PARSER_BACKENDS:
+        raise ValueError(
+            f"Unknown parser backend '{backend}', choose one of {PARSER_BACKENDS}")
+    return SoupNode(BeautifulSoup(html, backend))
+
+
+def as_html_node(soup):
+    """Wraps a BeautifulSoup object into an HtmlNode, leaving HtmlNodes untouched."""
+    if isinstance(soup, HtmlNode):
+        return soup
+    if isinstance(soup, Tag):
+        return SoupNode(soup)
+    raise ValueError("Invalid soup object provided")
+
+
+class HtmlNode(ABC):
+    """The small interface the extractors use, implemented once per parser backend.
+
+    Selectors are CSS selectors and only match descendants of the node, like
+    BeautifulSoup's `select`."""
+
+    tag = None
+
+    @abstractmethod
+    def find(self, selector):
+        """Returns the first descendant matching the selector, or None."""
+
+    @abstractmethod
+    def find_all(self, selector):
+        """Returns all descendants matching the selector in document order."""
+
+    @abstractmethod
+    def find_next(self, tag):
+        """Returns the next element with the tag name in document order, like BeautifulSoup's `find_next`."""
+
+    @abstractmethod
+    def find_by_string(self, text):
+        """Returns the first element whose `.string` (in the BeautifulSoup sense) equals the text."""
+
+    @abstractmethod
+    def has_string(self, text):
+        """Checks whether any text node of the document equals the text."""
+
+    @abstractmethod
+    def text(self, strip=False):
+        """Returns the concatenated text, with every text node stripped when `strip` is set."""
+
+    @abstractmethod
+    def get(self, attribute, default=None):
+        """Returns the value of an attribute of the node."""
+
+
+class SoupNode(HtmlNode):
+    """HtmlNode backed by a BeautifulSoup tag (html.parser or lxml tree builder)."""
+
+    def __init__(self, tag):
+        self._tag = tag
+        self.tag = tag.name
+
+    def find(self, selector):
+        found = self._tag.select_one(selector)
+        return SoupNode(found) if found is not None else None
+
+    def find_all(self, selector):
+        return [SoupNode(found) for found in self._tag.select(selector)]
+
+    def find_next(self, tag):
+        found = self._tag.find_next(tag)
+        return SoupNode(found) if found is not None else None
+
+    def find_by_string(self, text):
+        found = self._tag.find(lambda tag: tag.string == text)
+        return SoupNode(found) if found is not None else None
+
+    def has_string(self, text):
+        return self._tag.find(string=text) is not None
+
+    def text(self, strip=False):
+        if strip:
+            return self._tag.get_text(strip=True)
+        return self._tag.get_text()
+
+    def get(self, attribute, default=None):
+        return self._tag.get(attribute, default)
+
+
+class LexborNode(HtmlNode):
+    """HtmlNode backed by a selectolax (lexbor) node."""
+
+    def __init__(self, node):
+        self._node = node
+        self.tag = node.tag
+
+    def _descendants(self, selector):
+        # Lexbor also matches the node itself, BeautifulSoup only descendants
+        return (found for found in self._node.css(selector) if found.mem_id != self._node.mem_id)
+
+    def find(self, selector):
+        found = next(self._descendants(selector), None)
+        return LexborNode(found) if found is not None else None
+
+    def find_all(self, selector):
+        return [LexborNode(found) for found in self._descendants(selector)]
+
+    def find_next(self, tag):
+        for found in _following_elements(self._node):
+            if found.tag == tag:
+                return LexborNode(found)
+        return None
+
+    def find_by_string(self, text):
+        # Elements holding the text directly, found by lexbor in C
+        for candidate in self._node.css(f'*:lexbor-contains("{_escape(text)}")'):
+            if _own_string(candidate) != text:
+                continue
+            # BeautifulSoup's .string passes through single-child wrappers, so the
+            # outermost such wrapper is what soup.find returns first
+            while candidate.parent is not None and candidate.parent.tag != "-document" \
+                    and len(list(candidate.parent.iter(include_text=True))) == 1:
+                candidate = candidate.parent
+            return LexborNode(candidate)
+        return None
+
+    def has_string(self, text):
+        for candidate in self._node.css(f'*:lexbor-contains("{_escape(text)}")'):
+            for child in candidate.iter(include_text=True):
+                if child.tag == "-text" and child.text_content == text:
+                    return True
+        return False
+
+    def text(self, strip=False):
+        return self._node.text(deep=True, separator="", strip=strip)
+
+    def get(self, attribute, default=None):
+        value = self._node.attributes.get(attribute, default)
+        return default if value is None else value
+
+
+def _escape(text):
+    """Escapes a string for use inside a double-quoted CSS string."""
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _own_string(node):
+    """The text of a node if its only child is a text node, like BeautifulSoup's `.string`."""
+    children = list(node.iter(include_text=True))
+    if len(children) != 1:
+        return None
+    if children[0].tag == "-text":
+        return children[0].text_content
+    return _own_string(children[0])
+
+
+def _following_elements(node):
+    """Yields the elements after the node in document order, starting with its descendants."""
+    for descendant in node.traverse(include_text=False):
+        if descendant.mem_id != node.mem_id:
+            yield descendant
+    while node is not None:
+        sibling = node.next
+        while sibling is not None:
+            yield from sibling.traverse(include_text=False)
+            sibling = sibling.next
+        node = node.parent
@@ -0,0 +1,47 @@
+from requests.adapters import HTTPAdapter
+import threading
+import requests
+import os
+
+try:
+    import brotli  # noqa: F401 - lets urllib3 decode brotli responses
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+
+# Connections kept alive per session (one session per worker thread)
+POOL_SIZE = int(os.environ.get("SCRAPER_POOL_SIZE", 10))
+# (connect, read) timeouts in seconds, so a hung socket cannot block a worker forever
+CONNECT_TIMEOUT = float(os.environ.get("SCRAPER_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("SCRAPER_READ_TIMEOUT", 30))
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+}
+
+_local = threading.local()
+
+
+def create_session(pool_size=POOL_SIZE):
+    """Creates a requests session with a keep-alive connection pool and the default headers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(DEFAULT_HEADERS)
+    return session
+
+
+def get_session():
+    """Returns the session of the current worker thread, creating it on first use."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = create_session()
+        _local.session = session
+    return session
@@ -0,0 +1,114 @@
+from itertools import islice
+import sqlite3
+import os
+
+
+# Path of the link store, relative to the scraper directory by default
+LINK_STORE_FILE = os.environ.get("SCRAPER_LINK_STORE", "../car_listings.db")
+
+
+class LinkStore:
+    """
+    Indexed store of the collected car links. Every URL is stored once (unique
+    index) together with its make (secondary index), so the links of a single make
+    are looked up and streamed without loading the links of all makes.
+    """
+
+    def __init__(self, database_file=LINK_STORE_FILE):
+        # WAL lets crawler processes write concurrently, waiting up to 30 s for the write lock
+        self.conn = sqlite3.connect(database_file, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_table()
+
+    def create_table(self):
+        """Creates the links table and its make index if they do not exist."""
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS car_links (
+                url TEXT PRIMARY KEY,
+                make TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS car_links_make ON car_links(make);
+        """)
+        self.conn.commit()
+
+    def add_links(self, make, links):
+        """Adds the links of a make, ignoring URLs already stored. Returns the number of new links."""
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO car_links VALUES (?, ?)",
+            ((link.strip(), make) for link in links if link.strip()))
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def makes(self):
+        """Returns the makes with stored links, in alphabetical order."""
+        rows = self.conn.execute(
+            "SELECT DISTINCT make FROM car_links ORDER BY make")
+        return [row[0] for row in rows]
+
+    def has_make(self, make):
+        """Checks whether any links are stored for a make."""
+        return self.conn.execute(
+            "SELECT 1 FROM car_links WHERE make = ? LIMIT 1", (make,)).fetchone() is not None
+
+    def count_links(self, make=None):
+        """Counts the stored links, of a single make or of all makes."""
+        if make is None:
+            return self.conn.execute("SELECT COUNT(*) FROM car_links").fetchone()[0]
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM car_links WHERE make = ?", (make,)).fetchone()[0]
+
+    def iter_links(self, make, batch_size=1000):
+        """Streams the links of a make from a cursor, `batch_size` rows at a time."""
+        cursor = self.conn.execute(
+            "SELECT url FROM car_links WHERE make = ? ORDER BY rowid", (make,))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0]
+
+    def merge_from(self, database_file):
+        """Adds the links of another link store (e.g. of a crawl shard). Returns the number of new links."""
+        before = self.conn.total_changes
+        self.conn.execute("ATTACH DATABASE ? AS other", (database_file,))
+        try:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO car_links SELECT url, make FROM other.car_links")
+            self.conn.commit()
+        finally:
+            self.conn.execute("DETACH DATABASE other")
+        return self.conn.total_changes - before
+
+    def close(self):
+        """Closes the database connection."""
+        self.conn.close()
+
+
+class StoredLinks:
+    """
+    The links of a make in the link store. They are counted up front and streamed
+    from a cursor on iteration, through a connection closed once they are exhausted.
+    """
+
+    def __init__(self, make, database_file=LINK_STORE_FILE):
+        self.make = make
+        self.database_file = database_file
+        store = LinkStore(database_file)
+        try:
+            self.count = store.count_links(make)
+        finally:
+            store.close()
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        store = LinkStore(self.database_file)
+        try:
+            # Only the counted links, so the count holds while a crawler adds more
+            yield from islice(store.iter_links(self.make), self.count)
+        finally:
+            store.close()
@@ -0,0 +1,173 @@
+from utils.normalize import parse_int, parse_price, parse_power_hp, parse_fuel_consumption, parse_year_month
+import re
+
+try:
+    import orjson
+
+    def decode_json(raw):
+        return orjson.loads(raw)
+except ImportError:
+    import json
+
+    def decode_json(raw):
+        return json.loads(raw)
+
+
+# The framework's hydration state, embedded server-side into every detail page
+NEXT_DATA_PATTERN = re.compile(
+    rb'<script[^>]*id="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL)
+
+# Record key -> candidate paths into the listing details, the first path holding a value wins
+LISTING_FIELD_PATHS = {
+    "price": [("prices", "public", "priceRaw"), ("price", "priceRaw")],
+    "seller": [("seller", "type")],
+    "body_type": [("vehicle", "bodyType")],
+    "used_type": [("vehicle", "legalCategories"), ("vehicle", "offerType")],
+    "drivetrain": [("vehicle", "driveTrain"), ("vehicle", "drivetrain")],
+    "seats": [("vehicle", "numberOfSeats")],
+    "doors": [("vehicle", "numberOfDoors")],
+    "country_version": [("vehicle", "countryVersion")],
+    "model_code": [("vehicle", "modelCode"), ("vehicle", "hsnTsn")],
+    "mileage": [("vehicle", "mileageInKmRaw"), ("vehicle", "mileageInKm")],
+    "first_registration": [("vehicle", "firstRegistrationDateRaw"), ("vehicle", "firstRegistrationDate")],
+    "general_inspection": [("vehicle", "generalInspection"), ("vehicle", "nextInspection")],
+    "previous_owner": [("vehicle", "noOfPreviousOwners")],
+    "full_service_history": [("vehicle", "hasFullServiceHistory")],
+    "non_smoker_service": [("vehicle", "nonSmoking")],
+    "power": [("vehicle", "rawPowerInHp"), ("vehicle", "powerInHp")],
+    "gearbox": [("vehicle", "transmissionType")],
+    "engine_size": [("vehicle", "rawDisplacementInCCM"), ("vehicle", "displacementInCCM")],
+    "gears": [("vehicle", "gears")],
+    "cylinders": [("vehicle", "cylinders")],
+    "empty_weight": [("vehicle", "rawWeight"), ("vehicle", "weight")],
+    "fuel_type": [("vehicle", "fuelCategory", "formatted"), ("vehicle", "primaryFuel", "formatted")],
+    "fuel_consumption": [("vehicle", "fuelConsumptionCombined", "formatted")],
+    "emission_class": [("vehicle", "environmentEuDirective", "formatted")],
+    "emissions_sticker": [("vehicle", "environmentalSticker", "formatted"), ("vehicle", "emissionsSticker")],
+    "co2_emissions": [("vehicle", "co2emissionInGramPerKmWithFallback", "raw"), ("vehicle", "co2emissionInGramPerKm", "raw")],
+    "electric_range": [("vehicle", "electricRange", "raw"), ("vehicle", "electricRange")],
+    "exterior_colour": [("vehicle", "bodyColor")],
+    "manufacturer_colour": [("vehicle", "bodyColorOriginal")],
+    "paint": [("vehicle", "paintType")],
+    "upholstery_colour": [("vehicle", "upholsteryColor")],
+    "upholstery": [("vehicle", "upholstery")],
+}
+
+# Record key -> key of the item list in the vehicle's equipment object
+EQUIPMENT_CATEGORIES = {
+    "comfort_and_convenience": "comfortAndConvenience",
+    "entertainment_and_media": "entertainmentAndMedia",
+    "safety_and_security": "safetyAndSecurity",
+    "extras": "extras",
+}
+
+
+def extract_listing_json(html):
+    """Finds the embedded page JSON in the raw HTML and returns the listing details, or None if missing."""
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    match = NEXT_DATA_PATTERN.search(html)
+    if not match:
+        return None
+    try:
+        data = decode_json(match.group(1))
+    except ValueError as e:
+        print(f"An error occurred while decoding the page JSON: {e}")
+        return None
+    listing = dig(data, ("props", "pageProps", "listingDetails"))
+    return listing if isinstance(listing, dict) else None
+
+
+def scrape_car_details_from_json(listing):
+    """Maps the listing details of the page JSON to the record keys of `scrape_car_details_from_soup`."""
+    try:
+        vehicle = listing.get("vehicle") or {}
+        car_data = {
+            "car_title": join_present([vehicle.get("make"), vehicle.get("model")], " "),
+            "price": None,
+            "seller": None,
+            "location": scrape_json_location(listing),
+            "num_images": len(listing["images"]) if isinstance(listing.get("images"), list) else None,
+        }
+        for key, paths in LISTING_FIELD_PATHS.items():
+            car_data[key] = first_value(listing, paths)
+        for key, equipment_key in EQUIPMENT_CATEGORIES.items():
+            car_data[key] = scrape_json_equipment(vehicle, equipment_key)
+
+        # Bring the values into the same typed form the DOM extractor produces
+        car_data["price"] = parse_price(car_data["price"])
+        car_data["mileage"] = parse_int(car_data["mileage"])
+        car_data["first_registration"] = parse_year_month(
+            car_data["first_registration"])
+        car_data["previous_owner"] = parse_int(car_data["previous_owner"])
+        car_data["full_service_history"] = to_yes(
+            car_data["full_service_history"])
+        car_data["non_smoker_service"] = to_yes(car_data["non_smoker_service"])
+        car_data["power"] = parse_power_hp(car_data["power"])
+        car_data["fuel_consumption"] = parse_fuel_consumption(
+            car_data["fuel_consumption"])
+        for key in ["seats", "doors", "gears", "cylinders", "engine_size", "empty_weight", "co2_emissions", "electric_range"]:
+            car_data[key] = parse_int(car_data[key])
+        car_data["used_type"] = to_text(car_data["used_type"])
+        return car_data
+
+    except Exception as e:
+        print(f"\n!!! An error occurred while mapping the page JSON: {e} !!!\n")
+        return None
+
+
+def scrape_json_location(listing):
+    """Builds the location text ("street, zip city, country") from the listing location."""
+    location = listing.get("location") or {}
+    zip_city = join_present([location.get("zip"), location.get("city")], " ")
+    return join_present([location.get("street"), zip_city, location.get("countryCode")], ", ")
+
+
+def scrape_json_equipment(vehicle, equipment_key):
+    """Returns the item names of an equipment category as a list, like the DOM extractor."""
+    items = dig(vehicle, ("equipment", equipment_key)) or []
+    names = [item.get("formatted") if isinstance(item, dict) else item
+             for item in items]
+    names = [str(name).strip() for name in names if name not in (None, "")]
+    return names or None
+
+
+# ----- VALUE HELPERS -----
+def dig(data, path):
+    """Follows a path of keys into nested dicts, returning None if any key is missing."""
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def first_value(data, paths):
+    """Returns the value at the first path holding something other than None or ''."""
+    for path in paths:
+        value = dig(data, path)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def join_present(values, separator):
+    """Joins the non-empty values, returning None if there are none."""
+    values = [str(value).strip() for value in values if value not in (None, "")]
+    return separator.join(values) if values else None
+
+
+def to_yes(value):
+    """Turns a boolean flag into the "Yes" shown on the page, keeping text values."""
+    if isinstance(value, bool):
+        return "Yes" if value else None
+    return value
+
+
+def to_text(value):
+    """Turns lists into the text shown on the page."""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return join_present(value, ", ")
+    return str(value)
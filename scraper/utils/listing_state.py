@@ -0,0 +1,113 @@
+from datetime import datetime, timezone
+import threading
+import hashlib
+import sqlite3
+import json
+import os
+
+
+def hash_record(record):
+    """Stable hash of an extracted car record."""
+    encoded = json.dumps(record, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class ListingState:
+    """
+    Per-listing metadata of previous runs, used for incremental re-scraping: the
+    last fetch time, the ETag / Last-Modified validators sent by the site and a
+    hash of the last extracted record. The validators of a fetch are held back
+    until its record is written, so a crash or a failed write never leaves new
+    validators behind that would turn the next fetch of a changed page into a 304.
+    """
+
+    def __init__(self, database_file="listing_state.db"):
+        self.lock = threading.Lock()
+        self.pending_fetches = {}  # URL -> (fetch time, ETag, Last-Modified) of records not written yet
+        self.conn = sqlite3.connect(database_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS listings (
+                url TEXT PRIMARY KEY,
+                make TEXT,
+                fetched_at TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                record_hash TEXT
+            )
+        """)
+        self.conn.commit()
+
+    def conditional_headers(self, url):
+        """Returns the If-None-Match / If-Modified-Since headers for a listing recorded before."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, record_hash FROM listings WHERE url = ?", (url,)).fetchone()
+        # Only trust the validators once a record of the page has been saved
+        if not row or not row[2]:
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def record_fetch(self, url, make, etag=None, last_modified=None):
+        """Keeps the fetch time and the validators of a fetched page until its record is saved."""
+        fetched_at = datetime.now(timezone.utc).isoformat()
+        with self.lock:
+            self.pending_fetches[url] = (fetched_at, etag, last_modified)
+
+    def filter_changed(self, records):
+        """
+        Returns the records whose hash differs from the last saved one. The new hashes
+        are only stored by `record_saved`, once the records are written.
+        """
+        changed = []
+        with self.lock:
+            for record in records:
+                row = self.conn.execute(
+                    "SELECT record_hash FROM listings WHERE url = ?", (record["url"],)).fetchone()
+                if row and row[0] == hash_record(record):
+                    continue
+                changed.append(record)
+        return changed
+
+    def record_saved(self, records):
+        """Stores the hashes of written records together with the validators of their fetch."""
+        with self.lock:
+            updates = [(record["url"], record.get("make"), hash_record(record),
+                        *self.pending_fetches.pop(record["url"], (None, None, None)))
+                       for record in records]
+            self.conn.executemany("""
+                INSERT INTO listings (url, make, record_hash, fetched_at, etag, last_modified)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url) DO UPDATE SET
+                    make = excluded.make, record_hash = excluded.record_hash,
+                    fetched_at = COALESCE(excluded.fetched_at, fetched_at),
+                    etag = COALESCE(excluded.etag, etag),
+                    last_modified = COALESCE(excluded.last_modified, last_modified)
+            """, updates)
+            self.conn.commit()
+
+    def close(self):
+        """Closes the database connection."""
+        self.conn.close()
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_listing_state():
+    """Returns the listing state set in the SCRAPER_STATE_DB environment variable, or None if incremental scraping is off."""
+    global _state
+    database_file = os.environ.get("SCRAPER_STATE_DB")
+    if not database_file:
+        return None
+    with _state_lock:
+        if _state is None:
+            _state = ListingState(database_file)
+    return _state
@@ -0,0 +1,84 @@
+from datetime import date
+import re
+
+
+# Precompiled once, used for every listing
+NUMBER_PATTERN = re.compile(r'\d[\d,]*(?:\.\d+)?')
+PRICE_PATTERN = re.compile(r'[^\d]')
+POWER_HP_PATTERN = re.compile(r'\((\d+)\s*hp\)')
+FUEL_CONSUMPTION_PATTERN = re.compile(
+    r'(\d+(?:[.,]\d+)?)\s*(?:l|kwh|kg)/100\s*km(?:\s*\((comb)[^)]*\))?', re.IGNORECASE)
+MONTH_YEAR_PATTERN = re.compile(r'^\s*(\d{1,2})[/-](\d{4})\s*$')
+YEAR_MONTH_PATTERN = re.compile(r'^\s*(\d{4})-(\d{1,2})')
+
+
+def parse_int(value):
+    """
+    Parses the first number of a text ("112,000 km", "1,995 cc", "5") into an int,
+    ignoring "," thousands separators and truncating decimals ("1.5" -> 1).
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = NUMBER_PATTERN.search(value)
+    if not match:
+        return None
+    return int(float(match.group().replace(",", "")))
+
+
+def parse_price(value):
+    """Parses a price ("€ 23,490.-") into an int."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    digits = PRICE_PATTERN.sub('', value.split(".")[0])
+    return int(digits) if digits else None
+
+
+def parse_power_hp(value):
+    """Parses the horsepower of a power text ("140 kW (190 hp)") into an int."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = POWER_HP_PATTERN.search(value)
+    return int(match.group(1)) if match else parse_int(value)
+
+
+def parse_fuel_consumption(value):
+    """
+    Parses the combined consumption per 100 km ("5.6 l/100 km (comb.)") into a
+    float, taking the first value if none is marked as combined. Electric cars
+    list kWh/100 km and CNG cars kg/100 km, the unit follows from the fuel type.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    first = None
+    for match in FUEL_CONSUMPTION_PATTERN.finditer(value):
+        number = float(match.group(1).replace(",", "."))
+        if match.group(2):
+            return number
+        if first is None:
+            first = number
+    return first
+
+
+def parse_year_month(value):
+    """Parses "05/2019", "05-2019", "2019-05" or "2019-05-01" into the date of the first day of that month."""
+    if value is None or isinstance(value, date):
+        return value
+    match = MONTH_YEAR_PATTERN.match(value)
+    if match:
+        month, year = int(match.group(1)), int(match.group(2))
+    else:
+        match = YEAR_MONTH_PATTERN.match(value)
+        if not match:
+            return None
+        year, month = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        return None
+    return date(year, month, 1)
@@ -0,0 +1,72 @@
+from utils.car_schema import CAR_DETAILS_SCHEMA, EQUIPMENT_COLUMNS
+from datetime import date
+import pyarrow.parquet as pq
+import pyarrow as pa
+import uuid
+import os
+
+
+class CarDetailsWriter:
+    """
+    Streams car records into a Hive-partitioned Parquet dataset
+    (`<root>/make=<make>/scrape_date=<date>/part-*.parquet`).
+
+    Records are buffered and flushed in fixed-size batches, each flush writing new
+    part files, so the cost of a write only depends on the size of the batch and
+    never on the data already on disk.
+    """
+
+    def __init__(self, root="all_car_details", batch_size=1000, scrape_date=None, filter_records=None, on_flush=None):
+        self.root = root
+        self.batch_size = batch_size
+        self.scrape_date = scrape_date or date.today().isoformat()
+        self.filter_records = filter_records  # Optional: records -> records to write
+        self.on_flush = on_flush  # Optional: called with every flushed batch once it is on disk
+        self.buffer = []
+        self.rows_written = 0
+
+    def add(self, record):
+        """Adds a record, flushing the batch once it is full."""
+        self.buffer.append(record)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records as one part file per make."""
+        if not self.buffer:
+            return
+        batch = self.buffer
+        self.buffer = []
+        records = self.filter_records(batch) if self.filter_records else batch
+        by_make = {}
+        for record in records:
+            by_make.setdefault(record.get("make"), []).append(record)
+        for make, make_records in by_make.items():
+            self.write_part(make, make_records)
+        if self.on_flush:
+            self.on_flush(batch)
+
+    def write_part(self, make, records):
+        """Writes the records of a single make into a new part file of its partition."""
+        directory = os.path.join(
+            self.root, f"make={make}", f"scrape_date={self.scrape_date}")
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pylist(
+            [with_raw_equipment(record) for record in records], schema=CAR_DETAILS_SCHEMA)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        # Write under a hidden name first, so readers never see a partial file
+        temporary_path = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, temporary_path)
+        os.replace(temporary_path, os.path.join(directory, name))
+        self.rows_written += len(records)
+
+    def close(self):
+        """Flushes the remaining records."""
+        self.flush()
+
+
+def with_raw_equipment(record):
+    """Adds the raw ';'-joined text of every equipment list to a record."""
+    raw = {f"{column}_raw": ";".join(record[column]) if record.get(column) is not None else None
+           for column in EQUIPMENT_COLUMNS}
+    return record | raw
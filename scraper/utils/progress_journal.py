@@ -0,0 +1,69 @@
+import threading
+import sqlite3
+
+
+class ProgressJournal:
+    """
+    Durable progress journal of a detail scraping run. Completed URLs are committed
+    in small batches, right after their records are written, so an interrupted run
+    can resume within a make without fetching the finished URLs again. The journal
+    can be shared by threads.
+    """
+
+    def __init__(self, database_file="scrape_progress.db"):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(database_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS completed_urls (
+                url TEXT PRIMARY KEY,
+                make TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS completed_urls_make ON completed_urls(make);
+            CREATE TABLE IF NOT EXISTS completed_makes (
+                make TEXT PRIMARY KEY
+            );
+        """)
+        self.conn.commit()
+
+    def add_batch(self, records):
+        """Durably marks the URLs of a batch of written records as completed."""
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO completed_urls VALUES (?, ?)",
+                [(record["url"], record["make"]) for record in records])
+            self.conn.commit()
+
+    def is_completed(self, url):
+        """Checks whether a URL is already scraped."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT 1 FROM completed_urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def completed_urls(self, make):
+        """Returns the URLs of a make that are already scraped."""
+        rows = self.conn.execute(
+            "SELECT url FROM completed_urls WHERE make = ?", (make,))
+        return {row[0] for row in rows}
+
+    def is_make_done(self, make):
+        """Checks whether the records of a make were already saved."""
+        return self.conn.execute(
+            "SELECT 1 FROM completed_makes WHERE make = ?", (make,)).fetchone() is not None
+
+    def finish_make(self, make):
+        """Marks a make as saved and drops its journaled URLs."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO completed_makes VALUES (?)", (make,))
+        self.conn.execute("DELETE FROM completed_urls WHERE make = ?", (make,))
+        self.conn.commit()
+
+    def reset(self):
+        """Clears the journal after a completed run."""
+        self.conn.execute("DELETE FROM completed_urls")
+        self.conn.execute("DELETE FROM completed_makes")
+        self.conn.commit()
+
+    def close(self):
+        """Closes the database connection."""
+        self.conn.close()
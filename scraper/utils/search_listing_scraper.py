@@ -0,0 +1,86 @@
+from utils.listing_json_scraper import first_value, join_present
+from utils.normalize import parse_int, parse_price, parse_power_hp, parse_year_month
+
+
+# The paths below are unverified guesses at the search response layout, checked
+# only against the handwritten tests/fixtures/search_response.json
+
+# Candidate paths of the listing array in a search response or in the embedded page JSON
+SEARCH_LISTINGS_PATHS = [
+    ("pageProps", "listings"),
+    ("props", "pageProps", "listings"),
+    ("listings",),
+    ("data", "listings"),
+]
+
+# Record key -> candidate paths into a search result listing, the first path holding a value wins
+SEARCH_FIELD_PATHS = {
+    "price": [("tracking", "price"), ("price", "priceRaw"), ("price", "priceFormatted")],
+    "mileage": [("tracking", "mileage"), ("vehicle", "mileageInKmRaw"), ("vehicle", "mileageInKm")],
+    "first_registration": [("tracking", "firstRegistration"), ("vehicle", "firstRegistrationDate")],
+    "power": [("vehicle", "powerInHp"), ("vehicle", "power")],
+    "fuel_type": [("vehicle", "fuel"), ("tracking", "fuelType")],
+}
+
+# Icon name of a `vehicleDetails` entry -> record key, for values only shown on the card
+VEHICLE_DETAIL_ICONS = {
+    "mileage_road": "mileage",
+    "calendar": "first_registration",
+    "speedometer": "power",
+    "gas_pump": "fuel_type",
+}
+
+
+def extract_search_listings(data):
+    """Returns the listing array of a decoded search response (or page JSON), or an empty list."""
+    if not isinstance(data, dict):
+        return []
+    listings = first_value(data, SEARCH_LISTINGS_PATHS)
+    return listings if isinstance(listings, list) else []
+
+
+def scrape_listing_summary(listing, base_url):
+    """
+    Maps a search result listing to a partial car record: its URL and the summary
+    fields shown in the result list, typed like the detail records.
+    """
+    try:
+        href = listing.get("url")
+        if not href:
+            return None
+        vehicle = listing.get("vehicle") or {}
+        location = listing.get("location") or {}
+        record = {
+            "url": href if href.startswith("http") else base_url + href,
+            "car_title": join_present([vehicle.get("make"), vehicle.get("model")], " "),
+            "location": join_present([join_present([location.get("zip"), location.get("city")], " "),
+                                      location.get("countryCode")], ", "),
+        }
+        for key, paths in SEARCH_FIELD_PATHS.items():
+            record[key] = first_value(listing, paths)
+        for detail in listing.get("vehicleDetails") or []:
+            key = VEHICLE_DETAIL_ICONS.get(detail.get("iconName"))
+            if key and record.get(key) is None:
+                record[key] = detail.get("data")
+
+        record["price"] = parse_price(record["price"])
+        record["mileage"] = parse_int(record["mileage"])
+        record["first_registration"] = parse_year_month(
+            record["first_registration"])
+        record["power"] = parse_power_hp(record["power"])
+        return record
+
+    except Exception as e:
+        print(f"An error occurred while mapping a search listing: {e}")
+        return None
+
+
+def scrape_search_listings(data, base_url):
+    """Maps all listings of a decoded search response to partial car records."""
+    records = []
+    for listing in extract_search_listings(data):
+        if isinstance(listing, dict):
+            record = scrape_listing_summary(listing, base_url)
+            if record:
+                records.append(record)
+    return records
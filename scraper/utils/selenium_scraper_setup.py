@@ -3,18 +3,76 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from utils.html_parser import parse_html as parse_html_with_backend
+import base64
+import json
 import time
+import os
+import re
 
-def setup_selenium_driver():
-    """Sets up the Selenium WebDriver with Chrome options."""
+# Use the lightweight crawl profile below (set SCRAPER_LIGHT_BROWSER=0 for a full browser)
+LIGHTWEIGHT_PROFILE = os.environ.get("SCRAPER_LIGHT_BROWSER", "1") != "0"
+
+# Record the DevTools network events, to capture the search responses (see `capture_search_responses`)
+CAPTURE_SEARCH_RESPONSES = os.environ.get("SCRAPER_CAPTURE_SEARCH", "0") == "1"
+
+# URLs of the JSON responses the results page fetches its listings from
+SEARCH_RESPONSE_PATTERN = re.compile(
+    os.environ.get("SCRAPER_SEARCH_RESPONSE_PATTERN", r"/_next/data/.*/lst.*\.json|/api/.*search"))
+
+# Resources the link crawl never needs: images, fonts, media and tracking/ad scripts
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*hotjar.com*", "*criteo.com*",
+    "*adnxs.com*", "*taboola.com*", "*outbrain.com*",
+]
+
+
+def setup_selenium_driver(lightweight=LIGHTWEIGHT_PROFILE, capture_network=CAPTURE_SEARCH_RESPONSES):
+    """
+    Sets up the Selenium WebDriver with Chrome options. The lightweight profile
+    blocks images, fonts and trackers and returns from `get` once the DOM is ready
+    ("eager"), so pages are awaited with explicit waits instead of full page loads.
+    With `capture_network`, the DevTools network events are recorded in the
+    performance log.
+    """
     chrome_options = Options()
     chrome_options.add_argument("--headless")  # Run Chrome in headless mode
     chrome_options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")  # Set User-Agent
     chrome_options.binary_location = '/usr/bin/'
+    if lightweight:
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+        })
+        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+    if capture_network:
+        chrome_options.set_capability(
+            "goog:loggingPrefs", {"performance": "ALL"})
     driver = webdriver.Chrome(options=chrome_options)
+    if lightweight:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {
+                               "urls": BLOCKED_URL_PATTERNS})
     return driver
 
+
+def wait_for_results(driver, timeout=10):
+    """Waits until a category page shows its result articles or its header, returning False on timeout."""
+    try:
+        WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located(
+                (By.CSS_SELECTOR, 'article[data-source="listpage_search-results"], h1[data-testid="list-header-title"]'))
+        )
+        return True
+    except Exception:
+        print("Timed out waiting for the results to load.")
+        return False
+
 # def handle_cloudflare_challenge(driver, timeout=5):
 #     """Handles Cloudflare challenges if present."""
 #     try:
@@ -26,12 +84,87 @@ def setup_selenium_driver():
 #     except:
 #         print("No Cloudflare challenge detected.")
 
+# Reads everything the link crawler needs from a results page in the browser,
+# returning a small payload instead of the whole page source
+RESULTS_PAGE_SCRIPT = """
+var hrefs = [];
+document.querySelectorAll('article[data-source="listpage_search-results"]').forEach(function (article) {
+    var link = article.querySelector('a');
+    hrefs.push(link ? link.getAttribute('href') : null);
+});
+var header = document.querySelector('h1[data-testid="list-header-title"]');
+var current = document.querySelector('button[aria-current="page"]');
+var next = document.querySelector('li[class*="prev-next"] > button[aria-label="Go to next page"]');
+return {
+    hrefs: hrefs,
+    header: header ? header.textContent : null,
+    current_page: current ? parseInt(current.textContent, 10) : null,
+    has_next: !!next && next.getAttribute('aria-disabled') !== 'true',
+    has_pagination: !!document.querySelector('li[class*="prev-next"]')
+};
+"""
+
+
+def read_results_page(driver):
+    """
+    Reads the result hrefs, the result header text, the current page number and
+    whether there is a next page from the open results page in one script call.
+    """
+    return driver.execute_script(RESULTS_PAGE_SCRIPT)
+
+
+def wait_for_pagination(driver, timeout=5):
+    """
+    Waits until the pagination of the open results page is rendered (the eager
+    page load strategy returns before it is) and reads the page again. Returns
+    the last read page if no pagination shows up, e.g. on a single result page.
+    """
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda driver: read_results_page(driver)["has_pagination"])
+    except Exception:
+        print("No pagination rendered, treating the page as the last one.")
+    return read_results_page(driver)
+
+
+def capture_search_responses(driver):
+    """
+    Returns the decoded JSON bodies of the search responses received since the last
+    call, read from the DevTools network events of the performance log.
+    """
+    responses = []
+    for entry in driver.get_log("performance"):
+        try:
+            message = json.loads(entry["message"])["message"]
+            if message.get("method") != "Network.responseReceived":
+                continue
+            response = message["params"]["response"]
+            if "json" not in response.get("mimeType", "") or not SEARCH_RESPONSE_PATTERN.search(response.get("url", "")):
+                continue
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {
+                                          "requestId": message["params"]["requestId"]})
+            content = body["body"]
+            if body.get("base64Encoded"):
+                content = base64.b64decode(content)
+            responses.append(json.loads(content))
+        except Exception as e:
+            print(f"An error occurred while reading a search response: {e}")
+    return responses
+
+
+def read_embedded_search_data(driver):
+    """Returns the page JSON embedded in the open page (the listings of the first, server-rendered page)."""
+    content = driver.execute_script(
+        "var script = document.getElementById('__NEXT_DATA__'); return script ? script.textContent : null;")
+    return json.loads(content) if content else None
+
+
 def get_page_source(driver, url):
     """Retrieves the page source using Selenium, handling Cloudflare challenges."""
     driver.get(url)
     # handle_cloudflare_challenge(driver)
     return driver.page_source
 
-def parse_html(html):
-    """Parses HTML content with BeautifulSoup."""
-    return BeautifulSoup(html, 'html.parser')
+def parse_html(html, backend=None):
+    """Parses HTML content with the configured parser backend (see `utils.html_parser`)."""
+    return parse_html_with_backend(html, backend)
@@ -0,0 +1,108 @@
+from utils.car_schema import CAR_DETAILS_SCHEMA
+import pyarrow.parquet as pq
+import hashlib
+import shutil
+import os
+
+
+class Shard:
+    """
+    One of `count` nodes sharing a run. Work is assigned by a stable hash of its
+    key (make, power range or detail URL), so every node computes the same split
+    without talking to the others, and a rerun of a shard takes the same work.
+    """
+
+    def __init__(self, index, count):
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(f"Invalid shard {index}/{count}")
+        self.index = index
+        self.count = count
+
+    def owns(self, key):
+        """Checks whether the work with the given key belongs to this shard."""
+        return shard_of(key, self.count) == self.index
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+
+def parse_shard(text):
+    """Parses a shard given as "i/N" (0-based index, number of shards)."""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{text}', expected i/N (e.g. 0/4)")
+    return Shard(index, count)
+
+
+def shard_of(key, count):
+    """Stable shard of a key, the same in every process (unlike the salted `hash`)."""
+    digest = hashlib.md5(str(key).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+
+def power_range_key(make, low_kw, high_kw):
+    """Shard key of a (make, power range) crawl task."""
+    return f"{make}:{low_kw}-{high_kw}"
+
+
+def shard_output_dir(output_dir, shard):
+    """Output dataset of a shard, next to the merged dataset."""
+    return f"{output_dir}.shard-{shard.index}-of-{shard.count}"
+
+
+def merge_shard_outputs(shard_dirs, output_dir):
+    """
+    Combines the datasets written by the shards into `output_dir` without
+    rewriting them: every part file is hard-linked (copied across file systems)
+    to the same make/date partition of the merged dataset, then the `_metadata`
+    summary is rebuilt from the part file footers. Returns the number of files added.
+    """
+    added = 0
+    for shard_dir in shard_dirs:
+        for directory, _, files in os.walk(shard_dir):
+            for name in files:
+                if not name.endswith('.parquet') or name.startswith(('.', '_')):
+                    continue
+                relative_dir = os.path.relpath(directory, shard_dir)
+                target_dir = os.path.join(output_dir, relative_dir)
+                os.makedirs(target_dir, exist_ok=True)
+                target = os.path.join(target_dir, name)
+                if os.path.exists(target):
+                    continue  # Merged before, part file names are unique
+                try:
+                    os.link(os.path.join(directory, name), target)
+                except OSError:
+                    shutil.copy2(os.path.join(directory, name), target)
+                added += 1
+    write_dataset_metadata(output_dir)
+    return added
+
+
+def write_dataset_metadata(root):
+    """
+    Writes the `_metadata` and `_common_metadata` summary files of a partitioned
+    dataset, collecting the row group metadata of all part files from their footers.
+    """
+    collected = []
+    for directory, _, files in os.walk(root):
+        for name in sorted(files):
+            if not name.endswith('.parquet') or name.startswith(('.', '_')):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                metadata = pq.read_metadata(path)
+            except Exception as e:
+                print(f"An error occurred while reading the footer of {path}: {e}")
+                continue
+            if not metadata.schema.to_arrow_schema().equals(CAR_DETAILS_SCHEMA, check_metadata=False):
+                print(f"Skipping {path} in _metadata, written with an older schema.")
+                continue
+            metadata.set_file_path(os.path.relpath(path, root).replace(os.sep, '/'))
+            collected.append(metadata)
+    if not collected:
+        return
+    pq.write_metadata(CAR_DETAILS_SCHEMA, os.path.join(root, "_common_metadata"))
+    pq.write_metadata(CAR_DETAILS_SCHEMA, os.path.join(root, "_metadata"),
+                      metadata_collector=collected)
+    print(f"- Wrote _metadata of {len(collected)} part files.")
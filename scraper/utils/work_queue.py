@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+import threading
+import sqlite3
+import socket
+import json
+import time
+import uuid
+import os
+
+
+# Location of the shared work queue, a SQLite file by default
+WORK_QUEUE_LOCATION = os.environ.get("SCRAPER_WORK_QUEUE", "../work_queue.db")
+
+# Names of the queues of the link crawl and the detail scraping
+CRAWL_QUEUE = "crawl"
+DETAILS_QUEUE = "details"
+
+
+class WorkQueue(ABC):
+    """
+    Shared backlog of scraping tasks with lease semantics, worked off by workers on
+    any number of hosts. Tasks live in named queues ("crawl", "details") and are
+    identified by a key, so queueing the same work twice is a no-op.
+
+    - `lease` hands out a batch of pending tasks to this worker for
+      `visibility_timeout` seconds, during which no other worker gets them
+    - `ack` marks leased tasks as done, `nack` gives them back for a retry
+    - `requeue_expired` returns the tasks of expired leases (a crashed or stalled
+      worker) to the backlog, so a crash costs at most the work of one lease
+    - `reset` drops all tasks of a queue, so the next run can queue the same keys again
+
+    Delivery is at least once: a task whose lease expires while it is still being
+    worked on can run twice. A task is given up (state "failed") after
+    `max_attempts` leases. Backends implement the methods below; the local
+    `SqliteWorkQueue` is the only one so far.
+    """
+
+    @abstractmethod
+    def put(self, queue_name, tasks):
+        """Queues (key, payload, priority) tasks, lowest priority first, ignoring known keys. Returns the number of new tasks."""
+
+    @abstractmethod
+    def lease(self, queue_name, count=1, visibility_timeout=300):
+        """Leases up to `count` pending tasks, returning a list of (task id, payload)."""
+
+    @abstractmethod
+    def ack(self, task_ids):
+        """Marks tasks leased by this worker as done."""
+
+    @abstractmethod
+    def nack(self, task_ids, delay=0):
+        """Returns tasks leased by this worker to the backlog, available again after `delay` seconds."""
+
+    @abstractmethod
+    def requeue_expired(self, queue_name=None):
+        """Returns the tasks of expired leases to the backlog. Returns the number of tasks."""
+
+    @abstractmethod
+    def counts(self, queue_name):
+        """Returns the number of tasks per state of a queue."""
+
+    @abstractmethod
+    def reset(self, queue_name):
+        """Drops all tasks of a queue (done ones included), before a new run. Returns the number of tasks."""
+
+    def is_drained(self, queue_name):
+        """Checks whether a queue has no pending or leased tasks left."""
+        counts = self.counts(queue_name)
+        return not counts.get("pending") and not counts.get("leased")
+
+    def close(self):
+        pass
+
+
+class SqliteWorkQueue(WorkQueue):
+    """
+    Work queue in a SQLite file, shared by the threads and processes of one host
+    (or hosts sharing the file over a local disk). Leases are taken in an immediate
+    transaction, so two workers never lease the same task.
+    """
+
+    def __init__(self, database_file="../work_queue.db", max_attempts=3):
+        self.max_attempts = max_attempts
+        # Identifies this worker's leases, so a worker never acks a lease that expired and was taken over
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            database_file, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY,
+                queue TEXT NOT NULL,
+                task_key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT 'pending',
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (queue, task_key)
+            );
+            CREATE INDEX IF NOT EXISTS tasks_pending ON tasks(queue, state, priority, id);
+        """)
+
+    def put(self, queue_name, tasks):
+        rows = [(queue_name, key, json.dumps(payload), priority)
+                for key, payload, priority in tasks]
+        with self.lock:
+            before = self.conn.total_changes
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (queue, task_key, payload, priority) VALUES (?, ?, ?, ?)", rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            return self.conn.total_changes - before
+
+    def lease(self, queue_name, count=1, visibility_timeout=300):
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.expire_leases(now, queue_name)
+                rows = self.conn.execute("""
+                    SELECT id, payload FROM tasks
+                    WHERE queue = ? AND state = 'pending' AND available_at <= ?
+                    ORDER BY priority, id LIMIT ?
+                """, (queue_name, now, count)).fetchall()
+                self.conn.executemany("""
+                    UPDATE tasks SET state = 'leased', lease_owner = ?, available_at = ?, attempts = attempts + 1
+                    WHERE id = ?
+                """, [(self.owner, now + visibility_timeout, row[0]) for row in rows])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [(task_id, json.loads(payload)) for task_id, payload in rows]
+
+    def ack(self, task_ids):
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE tasks SET state = 'done', lease_owner = NULL WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                [(task_id, self.owner) for task_id in task_ids])
+
+    def nack(self, task_ids, delay=0):
+        with self.lock:
+            self.conn.executemany("""
+                UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                    lease_owner = NULL, available_at = ?
+                WHERE id = ? AND state = 'leased' AND lease_owner = ?
+            """, [(self.max_attempts, time.time() + delay, task_id, self.owner) for task_id in task_ids])
+
+    def requeue_expired(self, queue_name=None):
+        with self.lock:
+            return self.expire_leases(time.time(), queue_name)
+
+    def expire_leases(self, now, queue_name=None):
+        """Returns the tasks of leases expired before `now` to the backlog (caller holds the lock)."""
+        query = """
+            UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                lease_owner = NULL, available_at = 0
+            WHERE state = 'leased' AND available_at < ?
+        """
+        params = [self.max_attempts, now]
+        if queue_name is not None:
+            query += " AND queue = ?"
+            params.append(queue_name)
+        return self.conn.execute(query, params).rowcount
+
+    def counts(self, queue_name):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM tasks WHERE queue = ? GROUP BY state", (queue_name,))
+            return dict(rows.fetchall())
+
+    def reset(self, queue_name):
+        with self.lock:
+            return self.conn.execute("DELETE FROM tasks WHERE queue = ?", (queue_name,)).rowcount
+
+    def close(self):
+        """Closes the database connection."""
+        self.conn.close()
+
+
+def open_work_queue(location=WORK_QUEUE_LOCATION):
+    """Opens the work queue at a location. Only local SQLite files are supported so far."""
+    if "://" in location and not location.startswith("sqlite://"):
+        raise ValueError(f"No work queue backend for {location}")
+    return SqliteWorkQueue(location.replace("sqlite://", "", 1))